@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-18 07:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("payments", "0003_payment_provider_alter_payment_transaction_id"),
+        ("rides", "0010_ride_pickup_geohash"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(fields=["wallet", "timestamp", "id"], name="txn_wallet_timestamp_idx"),
+        ),
+    ]
@@ -53,6 +53,12 @@ class Transaction(models.Model):
     description = models.TextField(null=True, blank=True)
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Wallet history pages: (-timestamp, -id) per wallet
+            models.Index(fields=['wallet', 'timestamp', 'id'], name='txn_wallet_timestamp_idx'),
+        ]
+
     def __str__(self):
         return f"{self.transaction_type}: {self.amount} for {self.wallet.user.username}"
 
@@ -1,4 +1,5 @@
 from decimal import Decimal
+from django.core.exceptions import ValidationError
 from django.db import transaction as db_transaction
 from ..models import Payment, Wallet, Transaction
 from rides.models import Ride
@@ -112,8 +113,8 @@ class PaymentService:
                 )
 
             # 5. Mark Ride as FINISHED (payment completed and confirmed)
-            ride.status = 'FINISHED'
-            ride.save()
+            if Ride.transition(ride.id, ['COMPLETED', 'PAID'], 'FINISHED') is None:
+                raise ValidationError(f"Ride #{ride.id} is not awaiting payment")
 
     @staticmethod
     def process_payment_failure(payment_id: int, reason: str = ""):
@@ -7,6 +7,7 @@ from django.urls import reverse
 
 from .models import Payment
 from rides.models import Ride
+from rajbari_ride.pagination import KeysetPagination
 from .gateways.factory import PaymentGatewayFactory
 from .services.payment_service import PaymentService
 
@@ -70,24 +71,21 @@ class InitiatePaymentView(APIView):
                 logger.info(f"[CASH PAYMENT] Broadcasting PAYMENT_PENDING for ride {ride.id} to channel ride_{ride.id}")
                 print(f"[CASH PAYMENT DEBUG] Broadcasting to ride_{ride.id} - Amount: {amount_paid}")
                 
-                from channels.layers import get_channel_layer
-                from asgiref.sync import async_to_sync
-                layer = get_channel_layer()
-                async_to_sync(layer.group_send)(
-                    f"ride_{ride.id}",
-                    {
-                        "type": "ride_status_update",
-                        # We use a special status or just 'PAID' but with a flag? 
-                        # Let's use 'PAYMENT_PENDING' as agreed or just 'PAID' status on Ride 
-                        # but keeping Payment as PENDING.
-                        # Actually, keeping Ride as COMPLETED or similar until confirmed is safer.
-                        # But UI needs to know. Let's send a custom 'cash_pending_confirmation' event via status update.
-                        "status": "PAYMENT_PENDING", # Frontend will handle this to show 'Waiting for Driver'
-                        "ride_id": ride.id,
-                        "amount_paid": float(amount_paid),
-                        "driver_name": ride.driver.username if ride.driver else "Driver"
-                    }
-                )
+                from tracking.outbox import outbox
+                from tracking.push import push_to_users
+                update = {
+                    # We use a special status or just 'PAID' but with a flag? 
+                    # Let's use 'PAYMENT_PENDING' as agreed or just 'PAID' status on Ride 
+                    # but keeping Payment as PENDING.
+                    # Actually, keeping Ride as COMPLETED or similar until confirmed is safer.
+                    # But UI needs to know. Let's send a custom 'cash_pending_confirmation' event via status update.
+                    "status": "PAYMENT_PENDING", # Frontend will handle this to show 'Waiting for Driver'
+                    "ride_id": ride.id,
+                    "amount_paid": float(amount_paid),
+                    "driver_name": ride.driver.username if ride.driver else "Driver"
+                }
+                outbox.publish(f"ride_{ride.id}", {"type": "ride_status_update", **update})
+                push_to_users([ride.rider_id, ride.driver_id], {"type": "status_update", **update})
                 
                 logger.info(f"[CASH PAYMENT] Broadcast complete for ride {ride.id}")
                 print(f"[CASH PAYMENT DEBUG] Broadcast sent successfully")
@@ -159,9 +157,15 @@ class DemoPaymentCallbackView(APIView):
         
         return Response({"error": "Payment failed"}, status=status.HTTP_400_BAD_REQUEST)
 
+class WalletHistoryPagination(KeysetPagination):
+    ordering = ('-timestamp', '-id')
+    page_size = 20
+
 class WalletStatsView(APIView):
     """
     Get wallet balance and transaction stats for the current user.
+    `history` holds the latest transactions; pass `cursor` (from
+    `next_cursor` or the Link header) for older ones.
     """
     permission_classes = [IsAuthenticated]
 
@@ -184,8 +188,9 @@ class WalletStatsView(APIView):
             status='COMPLETED'
         ).aggregate(Sum('amount'))['amount__sum'] or 0
 
-        # Recent activities (last 20)
-        transactions = Transaction.objects.filter(wallet=wallet).order_by('-timestamp')[:20]
+        # Recent activities, a page at a time
+        paginator = WalletHistoryPagination()
+        transactions = paginator.paginate_queryset(Transaction.objects.filter(wallet=wallet), request, view=self)
         
         transactions_data = [{
             'id': t.id,
@@ -199,8 +204,9 @@ class WalletStatsView(APIView):
             'total_earnings': float(total_earnings),
             'balance': float(wallet.balance),
             'total_spent': float(total_spent),
-            'history': transactions_data
-        })
+            'history': transactions_data,
+            'next_cursor': paginator.next_cursor
+        }, headers=paginator.get_headers())
 
 class ConfirmCashPaymentView(APIView):
     """
@@ -235,10 +241,9 @@ class ConfirmCashPaymentView(APIView):
         PaymentService.process_payment_success(payment.id)
         
         # Broadcast FINISHED status to both driver and passenger
-        from channels.layers import get_channel_layer
-        from asgiref.sync import async_to_sync
-        layer = get_channel_layer()
-        async_to_sync(layer.group_send)(
+        from tracking.outbox import outbox
+        from tracking.push import push_to_users
+        outbox.publish(
             f"ride_{ride.id}",
             {
                 "type": "ride_status_update",
@@ -246,6 +251,14 @@ class ConfirmCashPaymentView(APIView):
                 "ride_id": ride.id
             }
         )
+        # Ride.save() already pushed FINISHED to ws/me/; this tells both apps the payment settled
+        push_to_users([ride.rider_id, ride.driver_id], {
+            "type": "payment_update",
+            "ride_id": ride.id,
+            "status": "COMPLETED",
+            "amount": str(payment.amount),
+            "provider": payment.provider
+        })
         
         return Response({
             "status": "SUCCESS",
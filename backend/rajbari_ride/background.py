@@ -0,0 +1,86 @@
+import asyncio
+import atexit
+import logging
+import threading
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    """
+    Runs `func` every `interval` seconds on a daemon thread, and once more
+    when the process exits (`on_stop` instead, if given) so buffered work
+    is not lost on shutdown. The thread is started lazily by `start()`,
+    which is safe to call often.
+    """
+
+    def __init__(self, name, interval, func, on_stop=None):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.on_stop = on_stop or func
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def stop(self):
+        self._stop.set()
+        self.run_once(self.on_stop)
+
+    def run_once(self, func=None):
+        close_old_connections()
+        try:
+            (func or self.func)()
+        except Exception:
+            logger.exception("Background task %s failed", self.name)
+        finally:
+            close_old_connections()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.run_once()
+
+
+class BackgroundLoop:
+    """
+    An event loop running forever on a daemon thread, for async work that
+    must outlive the request or task that started it (e.g. timed waves).
+    `submit()` starts the thread lazily and is safe from any thread.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def submit(self, coro):
+        """Schedules `coro` on the loop and returns its concurrent future."""
+        future = asyncio.run_coroutine_threadsafe(coro, self._start())
+        future.add_done_callback(self._log_failure)
+        return future
+
+    def _start(self):
+        if self._loop is not None:
+            return self._loop
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name=self.name, daemon=True).start()
+                self._loop = loop
+        return self._loop
+
+    def _log_failure(self, future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.error("Background coroutine on %s failed", self.name, exc_info=future.exception())
@@ -0,0 +1,72 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from channels.db import DatabaseSyncToAsync
+from django.conf import settings
+
+
+class DatabaseExecutor(ThreadPoolExecutor):
+    """
+    Bounded thread pool for the database work of async code (consumers, the
+    WebSocket auth middleware, dispatch waves).
+
+    `database_sync_to_async` is thread-sensitive by default, so every such
+    call in the process queues behind one shared thread. Each worker here
+    has its own Django connection instead, so up to `max_workers` calls run
+    at once; size it to what the database accepts per process. Queue depth
+    and the time calls wait for a free worker are tracked for `stats()`.
+    """
+
+    def __init__(self, max_workers=8):
+        super().__init__(max_workers=max_workers, thread_name_prefix='db-executor')
+        self.workers = max_workers
+        self._stats_lock = threading.Lock()
+        self.queued = 0
+        self.completed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def submit(self, fn, /, *args, **kwargs):
+        enqueued = time.monotonic()
+        with self._stats_lock:
+            self.queued += 1
+
+        def timed():
+            waited = time.monotonic() - enqueued
+            with self._stats_lock:
+                self.queued -= 1
+                self.completed += 1
+                self.total_wait += waited
+                self.max_wait = max(self.max_wait, waited)
+            return fn(*args, **kwargs)
+
+        return super().submit(timed)
+
+    def stats(self):
+        with self._stats_lock:
+            completed = self.completed
+            return {
+                'workers': self.workers,
+                'queue_depth': self.queued,
+                'completed': completed,
+                'avg_wait_ms': round(self.total_wait / completed * 1000, 3) if completed else 0.0,
+                'max_wait_ms': round(self.max_wait * 1000, 3),
+            }
+
+
+db_executor = DatabaseExecutor(max_workers=getattr(settings, 'DB_EXECUTOR_WORKERS', 8))
+
+
+class PooledDatabaseSyncToAsync(DatabaseSyncToAsync):
+    """
+    `database_sync_to_async` running on `db_executor`. Stale connections
+    are still closed around each call, per worker thread.
+    """
+
+    def __init__(self, func):
+        super().__init__(func, thread_sensitive=False, executor=db_executor)
+
+
+# Used like channels' `database_sync_to_async`, as a callable or decorator
+database_async = PooledDatabaseSyncToAsync
@@ -1,15 +1,15 @@
 from django.contrib.auth.models import AnonymousUser
-from rest_framework.authtoken.models import Token
-from channels.db import database_sync_to_async
+from users.authentication import token_cache
+from .db_executor import database_async
 from channels.middleware import BaseMiddleware
 
-@database_sync_to_async
+@database_async
 def get_user(token_key):
-    try:
-        token = Token.objects.get(key=token_key)
-        return token.user
-    except Token.DoesNotExist:
+    # Shared with the DRF authentication class; no queries when warm
+    result = token_cache.authenticate(token_key)
+    if result is None or not result[1].is_active:
         return AnonymousUser()
+    return result[1]
 
 class TokenAuthMiddleware(BaseMiddleware):
     async def __call__(self, scope, receive, send):
@@ -0,0 +1,128 @@
+import base64
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on a unique composite key such as (created_at, id).
+
+    Each page is one `WHERE key > cursor ORDER BY key LIMIT n+1` query, so
+    its cost does not grow with depth, and no COUNT(*) is run. The body
+    stays the plain list clients already read; the next page, if any, is
+    advertised in a `Link: <...>; rel="next"` header. Views can override
+    the key with a `keyset_ordering` attribute (set in `get_queryset()` if
+    it depends on the request); its fields must be model fields or
+    annotations, the last one unique.
+    """
+
+    ordering = ('-created_at', '-id')
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    page_size = getattr(settings, 'KEYSET_PAGE_SIZE', 50)
+    max_page_size = getattr(settings, 'KEYSET_MAX_PAGE_SIZE', 200)
+
+    def get_ordering(self, view):
+        return tuple(getattr(view, 'keyset_ordering', None) or self.ordering)
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    @staticmethod
+    def cursor_fields(queryset, ordering):
+        """Model fields (or annotation output fields) behind `ordering`."""
+        annotations = queryset.query.annotations
+        fields = []
+        for name in (field.lstrip('-') for field in ordering):
+            if name in annotations:
+                fields.append(annotations[name].output_field)
+            else:
+                fields.append(queryset.model._meta.get_field(name))
+        return fields
+
+    def decode_cursor(self, request, fields):
+        """
+        The cursor's values converted to `fields`' Python types, or None
+        without a cursor. Tampered or stale cursors are a 404, not a 500.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound("Invalid cursor")
+        if not isinstance(values, list) or len(values) != len(fields):
+            raise NotFound("Invalid cursor")
+        try:
+            values = [field.to_python(value) for field, value in zip(fields, values)]
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound("Invalid cursor")
+        if any(value is None for value in values):
+            raise NotFound("Invalid cursor")
+        return values
+
+    def encode_cursor(self, obj, ordering):
+        values = []
+        for field in ordering:
+            value = getattr(obj, field.lstrip('-'))
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode()
+
+    @staticmethod
+    def after(ordering, values):
+        """Q for rows strictly past `values` in `ordering` (lexicographic)."""
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        ordering = self.get_ordering(view)
+        self.request = request
+        self.ordering_used = ordering
+        self.page_size_used = self.get_page_size(request)
+
+        cursor = self.decode_cursor(request, self.cursor_fields(queryset, ordering))
+        queryset = queryset.order_by(*ordering)
+        if cursor is not None:
+            queryset = queryset.filter(self.after(ordering, cursor))
+
+        rows = list(queryset[:self.page_size_used + 1])
+        self.has_next = len(rows) > self.page_size_used
+        rows = rows[:self.page_size_used]
+        self.next_cursor = self.encode_cursor(rows[-1], ordering) if self.has_next else None
+        return rows
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_headers(self):
+        link = self.get_next_link()
+        return {'Link': f'<{link}>; rel="next"'} if link else {}
+
+    def get_paginated_response(self, data):
+        return Response(data, headers=self.get_headers())
+
+
+class TimestampKeysetPagination(KeysetPagination):
+    """Oldest first on (timestamp, id), for chat."""
+    ordering = ('timestamp', 'id')
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -82,13 +83,45 @@ TEMPLATES = [
 WSGI_APPLICATION = "rajbari_ride.wsgi.application"
 ASGI_APPLICATION = "rajbari_ride.asgi.application"
 
-CHANNEL_LAYERS = {
-    "default": {
-        "BACKEND": "channels.layers.InMemoryChannelLayer",
-    },
+# Channel layer
+# The in-memory layer only reaches sockets in the same process. Set REDIS_URL
+# to share groups across Daphne workers/replicas (required to run more than one).
+CHANNEL_LAYER_CONFIG = {
+    "capacity": int(os.environ.get('CHANNEL_CAPACITY', 100)), # queued messages per channel
+    "expiry": 60, # seconds an undelivered message is kept
+    "group_expiry": int(os.environ.get('CHANNEL_GROUP_EXPIRY', 86400)), # must outlive the longest socket
 }
 
+if os.environ.get('REDIS_URL'):
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {
+                "hosts": [os.environ.get('REDIS_URL')],
+                **CHANNEL_LAYER_CONFIG,
+            },
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels.layers.InMemoryChannelLayer",
+            "CONFIG": CHANNEL_LAYER_CONFIG,
+        },
+    }
+
+# Threads (each with its own DB connection) running the database calls of
+# consumers and the WebSocket auth middleware; keep under the DB's per-process limit
+DB_EXECUTOR_WORKERS = int(os.environ.get('DB_EXECUTOR_WORKERS', 8))
+
+# Realtime events from views/models are queued after commit and sent by a
+# dispatcher thread, at most this many per batch
+OUTBOX_BATCH_SIZE = 500
+
 CORS_ALLOW_ALL_ORIGINS = True
+# Paged lists advertise their next page in a Link header, which
+# cross-origin clients (the static frontend) can only read if exposed
+CORS_EXPOSE_HEADERS = ['Link']
 
 
 # Database
@@ -151,13 +184,17 @@ USE_TZ = True
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "users.authentication.CachedTokenAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
 }
 
+# List endpoints page by cursor (see rajbari_ride.pagination); ?limit= up to the max
+KEYSET_PAGE_SIZE = 50
+KEYSET_MAX_PAGE_SIZE = 200
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/6.0/howto/static-files/
 
@@ -178,3 +215,59 @@ SSLCOMMERZ_CONFIG = {
 # Payment Configuration
 PAYMENT_PROVIDER = 'DEMO' # Options: 'DEMO', 'BKASH', 'SSLCOMMERZ'
 PLATFORM_COMMISSION_RATE = 0.10 # 10%
+
+# Ride Dispatch Configuration
+# New rides are offered to the nearest DISPATCH_WAVE_SIZE drivers, then to the
+# next nearest every DISPATCH_WAVE_TIMEOUT seconds with a growing radius. The
+# last wave goes to every driver subscribed to the pickup's geocell.
+DISPATCH_WAVE_SIZE = 3
+DISPATCH_WAVE_TIMEOUT = 15 # seconds
+DISPATCH_MAX_WAVES = 4
+DISPATCH_INITIAL_RADIUS_KM = 3
+DISPATCH_RADIUS_GROWTH = 2
+DRIVER_CELL_PRECISION = 5 # geohash precision of those cells (~4.9km)
+
+# Proximity lookups (geohash-prefiltered)
+NEAREST_DRIVER_RADIUS_KM = 10
+AVAILABLE_RIDES_RADIUS_KM = 10 # also the max `radius_km` a driver can ask for
+AVAILABLE_RIDES_DEFAULT_LIMIT = 20
+AVAILABLE_RIDES_MAX_LIMIT = 50
+
+# Batch matcher (manage.py match_rides): max driver-to-pickup distance
+MATCHING_MAX_PICKUP_KM = 10
+
+# Driver locations are kept in memory and written to the DB in bulk every N seconds
+LOCATION_FLUSH_INTERVAL = 5
+
+# Driver presence: sockets and location fixes are heartbeats; online drivers
+# not seen for PRESENCE_TTL seconds are set offline by a sweep every N seconds
+PRESENCE_TTL = 90
+PRESENCE_SWEEP_INTERVAL = 30
+
+# Ride GPS trails: points per packed chunk and how often buffers are saved
+RIDE_TRAIL_CHUNK_SIZE = 256
+RIDE_TRAIL_FLUSH_INTERVAL = 10
+
+# Ride sockets get at most one position per user per tick (seconds)
+LOCATION_FANOUT_TICK = 1.0
+
+# Chat sent over the ride socket is delivered at once and saved in batches
+CHAT_FLUSH_INTERVAL = 1 # seconds
+CHAT_BATCH_SIZE = 100
+
+# Token auth cache (HTTP and WebSocket). Logouts and profile changes apply at
+# once in the same process and within AUTH_TOKEN_CACHE_TTL seconds elsewhere.
+AUTH_TOKEN_CACHE_TTL = 60
+AUTH_TOKEN_CACHE_SIZE = 10000
+
+# Offline road routing: OSM XML extract of Rajbari district (e.g. exported from
+# openstreetmap.org or cut with osmium). When the file is missing, fares fall
+# back to straight-line distance. The compiled graph is cached as <path>.graph.npz.
+ROUTING_OSM_PATH = os.environ.get('ROUTING_OSM_PATH', BASE_DIR / 'data' / 'rajbari.osm')
+ROUTING_CACHE_SIZE = 50000 # cached node-to-node results
+
+# Fare estimate caching
+VEHICLE_RATES_TTL = 60 # seconds before other processes see VehicleType edits
+FARE_QUOTE_CACHE_SIZE = 10000
+FARE_QUOTE_TTL = 300 # seconds
+FARE_QUOTE_GRID_METERS = 20 # pickup/drop points are snapped to this grid
@@ -16,13 +16,14 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from .views import home
+from .views import home, DatabaseExecutorStatsView
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/users/", include("users.urls")),
     path("api/rides/", include("rides.urls")),
     path("api/payments/", include("payments.urls")),
+    path("api/db-executor/stats/", DatabaseExecutorStatsView.as_view(), name="db-executor-stats"),
     # Serve Frontend Monolithically
     path("", home, name="home"),
 ]
@@ -1,4 +1,16 @@
 from django.shortcuts import render
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .db_executor import db_executor
 
 def home(request):
     return render(request, 'index.html')
+
+class DatabaseExecutorStatsView(APIView):
+    """Queue depth and wait times of this process's consumer DB pool, for tuning."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(db_executor.stats())
@@ -1,32 +1,44 @@
+from django.conf import settings
 from django.contrib.auth.models import User
-from .utils import calculate_distance
+from users.models import Profile
+from .spatial_index import driver_index
 
-def find_nearest_driver(ride):
+# How many index hits to re-check against the database in one query, so a
+# driver who went offline in another process does not end the search.
+CANDIDATE_POOL = 5
+
+# Radius for the database fallback used when the grid has no candidate
+# (e.g. a driver came online in another process since the last refresh).
+FALLBACK_RADIUS_KM = getattr(settings, 'NEAREST_DRIVER_RADIUS_KM', 10)
+
+def find_nearest_driver(ride, exclude=()):
     """
-    Finds the nearest online driver who hasn't rejected this ride.
+    Finds the nearest online driver who hasn't rejected this ride
+    (and is not in `exclude`).
     """
-    pickup_lat = float(ride.pickup_lat)
-    pickup_lng = float(ride.pickup_lng)
-    
-    # Filter drivers
-    drivers = User.objects.filter(
-        profile__role='DRIVER',
-        profile__is_online=True,
-        profile__current_lat__isnull=False,
-        profile__current_lng__isnull=False
-    ).exclude(rejected_rides=ride) # Exclude drivers who rejected this ride
-    
-    nearest_driver = None
-    min_dist = float('inf')
-    
-    for driver in drivers:
-        dist = calculate_distance(
-            pickup_lat, pickup_lng, 
-            float(driver.profile.current_lat), 
-            float(driver.profile.current_lng)
-        )
-        if dist < min_dist:
-            min_dist = dist
-            nearest_driver = driver
-            
-    return nearest_driver
+    rejected = set(ride.rejected_drivers.values_list('id', flat=True))
+    rejected.update(exclude)
+
+    # Nearest candidates from the in-memory grid (no per-driver DB rows)
+    candidates = driver_index.nearest(
+        ride.pickup_lat, ride.pickup_lng,
+        k=CANDIDATE_POOL,
+        exclude=rejected
+    )
+    if candidates:
+        ids = [user_id for user_id, _ in candidates]
+        drivers = User.objects.filter(
+            pk__in=ids,
+            profile__role='DRIVER',
+            profile__is_online=True
+        ).in_bulk()
+
+        for user_id in ids:
+            if user_id in drivers:
+                return drivers[user_id]
+
+    # Geohash-prefiltered DB lookup around the pickup
+    profile = Profile.objects.online_drivers().near(
+        ride.pickup_lat, ride.pickup_lng, FALLBACK_RADIUS_KM
+    ).exclude(user_id__in=rejected).select_related('user').order_by('distance').first()
+    return profile.user if profile else None
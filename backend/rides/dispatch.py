@@ -0,0 +1,209 @@
+import asyncio
+import threading
+
+from django.conf import settings
+from django.db import transaction
+
+from rajbari_ride.background import BackgroundLoop
+from rajbari_ride.db_executor import database_async
+from tracking.outbox import outbox
+
+from .geo import encode_geohash, geohash_neighbors
+from .models import Ride
+from .spatial_index import driver_index
+
+# Geohash precision of the driver notification cells (5 = ~4.9km x 4.9km)
+DRIVER_CELL_PRECISION = getattr(settings, 'DRIVER_CELL_PRECISION', 5)
+
+
+def driver_group_name(user_id):
+    """Personal channel group joined by a driver's notification socket."""
+    return f'driver_{user_id}'
+
+
+def cell_group_name(cell):
+    """Channel group of the drivers around a geohash cell."""
+    return f'drivers_{cell}'
+
+
+def driver_cell_groups(lat, lng):
+    """
+    Groups a driver at (lat, lng) subscribes to: their own cell and its 8
+    neighbours, so an event published to one pickup cell reaches every
+    driver within about a cell's width of it.
+    """
+    if lat is None or lng is None:
+        return set()
+    return {cell_group_name(cell) for cell in geohash_neighbors(lat, lng, DRIVER_CELL_PRECISION)}
+
+
+def driver_moved_event(previous, lat, lng):
+    """
+    The `driver_moved` event to send to a driver's personal group after a
+    new fix, or None when they stayed in the same cell. `previous` is the
+    last known (lat, lng) or None; pass lat=lng=None when going offline.
+    """
+    if previous is not None and lat is not None and (
+        encode_geohash(*previous, DRIVER_CELL_PRECISION) == encode_geohash(lat, lng, DRIVER_CELL_PRECISION)
+    ):
+        return None
+    return {'type': 'driver_moved', 'lat': lat, 'lng': lng}
+
+
+def notify_driver(user_id, event):
+    """Sends an event to a driver's notification socket from sync code (no-op for None)."""
+    if event is not None:
+        outbox.publish(driver_group_name(user_id), event)
+
+
+class RideDispatcher:
+    """
+    Offers a new ride to the K nearest eligible drivers in expanding waves.
+
+    Waves run on the dispatcher's own long-lived event loop, so they keep
+    going after the request that created the ride has returned. Wave 0 goes
+    out as soon as the ride is committed. Each following wave
+    waits `wave_timeout` seconds, grows the search radius by `radius_growth`
+    and offers the ride to the next K nearest drivers who have not been
+    offered it yet and are not in `rejected_drivers`. The last wave is
+    published to the pickup's geocell group instead, reaching every nearby
+    driver (including those only known to other worker processes). Waves
+    stop as soon as the ride leaves REQUESTED or `max_waves` is reached;
+    after that the ride is still listed in AvailableRidesView.
+    """
+
+    def __init__(self, wave_size=3, wave_timeout=15, max_waves=4, initial_radius_km=3, radius_growth=2):
+        self.wave_size = wave_size
+        self.wave_timeout = wave_timeout
+        self.max_waves = max_waves
+        self.initial_radius_km = initial_radius_km
+        self.radius_growth = radius_growth
+        self._offered = {}  # ride_id -> set of driver ids already offered
+        self._lock = threading.Lock()
+        self._scheduler = BackgroundLoop('dispatch-waves')
+
+    def offered_to(self, ride_id):
+        with self._lock:
+            return set(self._offered.get(ride_id, ()))
+
+    def _mark_offered(self, ride_id, driver_ids):
+        with self._lock:
+            self._offered.setdefault(ride_id, set()).update(driver_ids)
+
+    def _forget(self, ride_id):
+        with self._lock:
+            self._offered.pop(ride_id, None)
+
+    def radius_for_wave(self, wave):
+        return self.initial_radius_km * (self.radius_growth ** wave)
+
+    # --- Sync entry points (called from views) ---
+
+    def dispatch(self, ride):
+        """
+        Starts the waves once the ride is committed and visible to the
+        dispatcher's queries; returns without waiting for any of them.
+        """
+        transaction.on_commit(lambda: self._scheduler.submit(self._run_waves(ride.id)))
+
+    def offer_to(self, ride, drivers):
+        """Offers a ride to specific drivers right away (e.g. after a REJECT)."""
+        from .serializers import RideSerializer
+
+        driver_ids = [driver.id for driver in drivers]
+        if not driver_ids:
+            return
+        payload = RideSerializer(ride).data
+        self._send_offers(ride.id, driver_ids, payload)
+
+    # --- Async wave loop ---
+
+    async def _run_waves(self, ride_id):
+        try:
+            for wave in range(self.max_waves):
+                if wave > 0:
+                    await asyncio.sleep(self.wave_timeout)
+                if not await self._offer_wave(ride_id, wave):
+                    break
+        finally:
+            self._forget(ride_id)
+
+    async def _offer_wave(self, ride_id, wave):
+        """Returns False once the ride no longer needs a driver."""
+        if wave > 0 and wave == self.max_waves - 1:
+            result = await database_async(self._cell_wave)(ride_id)
+            if result is not None:
+                self._broadcast_offer(*result)
+            return False
+
+        result = await database_async(self._next_wave)(ride_id, wave)
+        if result is None:
+            return False
+        driver_ids, payload = result
+        self._send_offers(ride_id, driver_ids, payload)
+        return True
+
+    def _next_wave(self, ride_id, wave):
+        from .serializers import RideSerializer
+
+        ride = Ride.objects.filter(pk=ride_id, status='REQUESTED', driver__isnull=True).first()
+        if ride is None:
+            return None
+
+        exclude = self.offered_to(ride_id)
+        exclude.update(ride.rejected_drivers.values_list('id', flat=True))
+        hits = driver_index.nearest(
+            ride.pickup_lat, ride.pickup_lng,
+            k=self.wave_size,
+            exclude=exclude,
+            max_radius_km=self.radius_for_wave(wave)
+        )
+        driver_ids = [user_id for user_id, _ in hits]
+        return driver_ids, (RideSerializer(ride).data if driver_ids else None)
+
+    def _cell_wave(self, ride_id):
+        from .serializers import RideSerializer
+
+        ride = Ride.objects.filter(pk=ride_id, status='REQUESTED', driver__isnull=True).first()
+        if ride is None:
+            return None
+        cell = encode_geohash(ride.pickup_lat, ride.pickup_lng, DRIVER_CELL_PRECISION)
+        # Drivers already asked or who said no are skipped by their consumer
+        exclude = self.offered_to(ride_id)
+        exclude.update(ride.rejected_drivers.values_list('id', flat=True))
+        return cell, sorted(exclude), RideSerializer(ride).data
+
+    # Offers go through the outbox queue so neither the request nor the
+    # wave loop waits on the channel layer
+
+    def _broadcast_offer(self, cell, exclude, payload):
+        outbox.enqueue(
+            cell_group_name(cell),
+            {
+                'type': 'new_ride_request',
+                'ride': payload,
+                'exclude': exclude
+            }
+        )
+
+    def _send_offers(self, ride_id, driver_ids, payload):
+        if not driver_ids:
+            return
+        self._mark_offered(ride_id, driver_ids)
+        for driver_id in driver_ids:
+            outbox.enqueue(
+                driver_group_name(driver_id),
+                {
+                    'type': 'new_ride_request',
+                    'ride': payload
+                }
+            )
+
+
+dispatcher = RideDispatcher(
+    wave_size=getattr(settings, 'DISPATCH_WAVE_SIZE', 3),
+    wave_timeout=getattr(settings, 'DISPATCH_WAVE_TIMEOUT', 15),
+    max_waves=getattr(settings, 'DISPATCH_MAX_WAVES', 4),
+    initial_radius_km=getattr(settings, 'DISPATCH_INITIAL_RADIUS_KM', 3),
+    radius_growth=getattr(settings, 'DISPATCH_RADIUS_GROWTH', 2),
+)
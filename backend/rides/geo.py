@@ -0,0 +1,128 @@
+import math
+
+from django.db import models
+from django.db.models.functions import ASin, Cast, Cos, Power, Radians, Sin, Sqrt
+
+from .utils import EARTH_RADIUS_KM
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 7 # ~150m x 150m cells, what the indexed columns store
+
+
+def encode_geohash(lat, lng, precision=GEOHASH_PRECISION):
+    lat, lng = float(lat), float(lng)
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bits, ch, even = 0, 0, True
+    while len(chars) < precision:
+        rng, value = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        ch <<= 1
+        if value >= mid:
+            ch |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[ch])
+            bits, ch = 0, 0
+    return ''.join(chars)
+
+
+def geohash_cell_size(precision):
+    """(height, width) of a cell in degrees."""
+    lng_bits = math.ceil(precision * 5 / 2)
+    lat_bits = precision * 5 // 2
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lng_bits)
+
+
+def geohash_neighbors(lat, lng, precision):
+    """The cell containing the point and its 8 neighbours."""
+    height, width = geohash_cell_size(precision)
+    cells = set()
+    for d_lat in (-height, 0, height):
+        for d_lng in (-width, 0, width):
+            n_lat = max(min(float(lat) + d_lat, 90.0), -90.0)
+            n_lng = (float(lng) + d_lng + 180.0) % 360.0 - 180.0
+            cells.add(encode_geohash(n_lat, n_lng, precision))
+    return cells
+
+
+def geohash_cover(lat, lng, radius_km, max_precision=GEOHASH_PRECISION):
+    """
+    Geohash prefixes whose union contains every point within `radius_km`.
+    Uses the finest precision whose cells are at least `radius_km` on their
+    shortest side, so the 3x3 block around the point is enough.
+    Returns an empty set when the radius is too large to narrow anything.
+    """
+    cos_lat = max(math.cos(math.radians(float(lat))), 0.01)
+    for precision in range(max_precision, 0, -1):
+        height, width = geohash_cell_size(precision)
+        if min(height * 110.57, width * 111.32 * cos_lat) >= radius_km:
+            return geohash_neighbors(lat, lng, precision)
+    return set()
+
+
+def geohash_successor(prefix):
+    """Smallest string above every geohash starting with `prefix` (None if unbounded)."""
+    chars = list(prefix)
+    while chars:
+        index = GEOHASH_ALPHABET.index(chars[-1])
+        if index + 1 < len(GEOHASH_ALPHABET):
+            chars[-1] = GEOHASH_ALPHABET[index + 1]
+            return ''.join(chars)
+        chars.pop()
+    return None
+
+
+def haversine_expression(lat_field, lng_field, lat, lng):
+    """
+    ORM expression for the great circle distance in km from (lat, lng) to
+    the row's (lat_field, lng_field). Works on SQLite and Postgres.
+    """
+    float_field = models.FloatField()
+    row_lat = Radians(Cast(lat_field, float_field))
+    row_lng = Radians(Cast(lng_field, float_field))
+    lat = math.radians(float(lat))
+    lng = math.radians(float(lng))
+
+    a = (
+        Power(Sin((row_lat - models.Value(lat)) / 2), 2) +
+        Cos(row_lat) * models.Value(math.cos(lat)) * Power(Sin((row_lng - models.Value(lng)) / 2), 2)
+    )
+    return models.ExpressionWrapper(
+        models.Value(2 * EARTH_RADIUS_KM) * ASin(Sqrt(a)),
+        output_field=float_field
+    )
+
+
+class GeoQuerySet(models.QuerySet):
+    """
+    Proximity filtering for models with a lat/lng pair and an indexed
+    geohash column. Subclasses name the three fields.
+    """
+    lat_field = None
+    lng_field = None
+    geohash_field = None
+
+    def in_cells(self, prefixes):
+        """Narrows to rows whose geohash starts with one of `prefixes` (index range scans)."""
+        condition = models.Q()
+        for prefix in prefixes:
+            bounds = {f'{self.geohash_field}__gte': prefix}
+            upper = geohash_successor(prefix)
+            if upper:
+                bounds[f'{self.geohash_field}__lt'] = upper
+            condition |= models.Q(**bounds)
+        return self.filter(condition) if condition else self
+
+    def near(self, lat, lng, radius_km, annotate_as='distance'):
+        """
+        Rows within `radius_km` of (lat, lng), annotated with their distance
+        in km. Cell prefixes narrow the scan before the exact haversine check.
+        """
+        return self.in_cells(geohash_cover(lat, lng, radius_km)).annotate(**{
+            annotate_as: haversine_expression(self.lat_field, self.lng_field, lat, lng)
+        }).filter(**{f'{annotate_as}__lte': radius_km})
@@ -0,0 +1,28 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rides.routing import RoadGraph
+
+class Command(BaseCommand):
+    help = 'Compiles the OSM extract into the routing graph used for fares and ETAs (<path>.graph.npz)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--osm', default=None, help='OSM XML extract (defaults to settings.ROUTING_OSM_PATH)')
+        parser.add_argument('--landmarks', type=int, default=8, help='Number of ALT landmarks to precompute')
+
+    def handle(self, *args, **options):
+        path = str(options['osm'] or getattr(settings, 'ROUTING_OSM_PATH', ''))
+        if not path:
+            raise CommandError("No OSM extract given and ROUTING_OSM_PATH is not set")
+
+        started = time.monotonic()
+        try:
+            graph = RoadGraph.from_osm(path, landmark_count=options['landmarks'])
+        except (OSError, SyntaxError) as e:
+            raise CommandError(f"Could not read {path}: {e}")
+
+        graph.save(f'{path}.graph.npz')
+        self.stdout.write(self.style.SUCCESS(
+            f"{graph.node_count} nodes, {len(graph.targets)} edges, {len(graph.from_landmarks)} landmarks "
+            f"-> {path}.graph.npz in {time.monotonic() - started:.1f} s"
+        ))
@@ -0,0 +1,82 @@
+import re
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from payments.models import Transaction
+from rides.models import ACTIVE_RIDE_STATUSES, ChatMessage, Ride, ScheduledRideRequest
+from users.models import Profile
+
+# Plan lines that mean a full table read, per backend
+SEQUENTIAL_SCAN = {
+    'sqlite': re.compile(r'\bSCAN (?!CONSTANT ROW)(?!\()(\w+)\b(?! USING (COVERING )?INDEX)'),
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+}
+
+
+def hot_queries():
+    """(name, queryset) for the queries behind the busiest endpoints and loops."""
+    user = User(pk=1, username='explain')
+    now = timezone.now()
+    return [
+        ('available rides', Ride.objects.for_serializer(user).filter(status='REQUESTED', driver__isnull=True)
+            .near(23.76, 89.65, 10).order_by('distance', 'id')[:21]),
+        ('ride history', Ride.objects.for_serializer(user)
+            .filter(models.Q(rider=user) | models.Q(driver=user)).order_by('-created_at', '-id')[:51]),
+        ('my ride requests', Ride.objects.for_serializer(user).filter(rider=user).order_by('-created_at', '-id')[:51]),
+        ('current ride', Ride.objects.filter(models.Q(rider=user) | models.Q(driver=user))
+            .exclude(status__in=['CANCELLED', 'FINISHED']).order_by('-created_at')[:1]),
+        ('scheduled rides', Ride.objects.for_serializer(user)
+            .filter(is_scheduled=True, scheduled_datetime__gt=now, available_seats__gt=0)
+            .order_by('-created_at', '-id')[:51]),
+        ('pending rides (matcher)', Ride.objects.filter(status='REQUESTED', driver__isnull=True, is_scheduled=False)
+            .exclude(negotiation_status='PENDING').order_by('created_at')),
+        ('busy drivers', Ride.objects.filter(status__in=['ASSIGNED', 'ONGOING'], driver__isnull=False).values('driver_id')),
+        ('active rides', Ride.objects.filter(status__in=ACTIVE_RIDE_STATUSES).order_by('created_at')),
+        ('driver earnings', Ride.objects.filter(driver=user, status='PAID')),
+        ('online drivers', Profile.objects.online_drivers().values_list('user_id', 'current_lat', 'current_lng')),
+        ('seat requests', ScheduledRideRequest.objects.filter(passenger=user).order_by('-created_at', '-id')[:51]),
+        ('chat page', ChatMessage.objects.filter(ride_id=1).select_related('sender')
+            .filter(models.Q(sender=user) | models.Q(receiver=user)).order_by('timestamp', 'id')[:51]),
+        ('wallet history', Transaction.objects.filter(wallet_id=1).order_by('-timestamp', '-id')[:21]),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'EXPLAINs the hot ORM queries and fails if any of them reads a whole table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help='Print every plan, not just failing ones')
+
+    def handle(self, *args, **options):
+        pattern = SEQUENTIAL_SCAN.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(f"Query plans are only checked on SQLite and PostgreSQL, not {connection.vendor}")
+
+        failures = []
+        for name, queryset in hot_queries():
+            plan = self.explain(queryset)
+            scanned = sorted(set(match.group(1) for match in pattern.finditer(plan)))
+            if scanned:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f"{name}: sequential scan on {', '.join(scanned)}"))
+            else:
+                self.stdout.write(f"{name}: ok")
+            if scanned or options['verbose_plans']:
+                self.stdout.write('    ' + plan.replace('\n', '\n    '))
+
+        if failures:
+            raise CommandError(f"{len(failures)} hot queries fall back to a sequential scan")
+        self.stdout.write(self.style.SUCCESS("All hot queries use indexes"))
+
+    def explain(self, queryset):
+        if connection.vendor != 'postgresql':
+            return queryset.explain()
+        # Small or empty tables are always cheapest to scan; with seq scans
+        # priced out, Postgres only picks one when no index can serve the query
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            return queryset.explain()
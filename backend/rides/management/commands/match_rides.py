@@ -0,0 +1,36 @@
+import time
+from django.core.management.base import BaseCommand
+from rides.matching import matcher
+
+class Command(BaseCommand):
+    help = 'Matches pending REQUESTED rides to idle online drivers in one batch (min total pickup distance)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report the matching and its gain over greedy without assigning')
+        parser.add_argument('--interval', type=float, default=0, help='Repeat every N seconds (0 = run once)')
+        parser.add_argument('--max-pickup-km', type=float, default=None, help='Ignore driver/ride pairs further apart than this')
+
+    def handle(self, *args, **options):
+        if options['max_pickup_km'] is not None:
+            matcher.max_pickup_km = options['max_pickup_km']
+
+        while True:
+            started = time.monotonic()
+            report = matcher.run(dry_run=options['dry_run'])
+            self.print_report(report, options['dry_run'], time.monotonic() - started)
+
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def print_report(self, report, dry_run, elapsed):
+        saved = report['greedy_pickup_km'] - report['total_pickup_km']
+        self.stdout.write(
+            f"{report['rides']} rides, {report['drivers']} idle drivers -> "
+            f"{report['matched']} matched, {report['total_pickup_km']:.2f} km total pickup "
+            f"(greedy: {report['greedy_matched']} matched, {report['greedy_pickup_km']:.2f} km; "
+            f"saved {saved:.2f} km) in {elapsed * 1000:.0f} ms"
+        )
+        label = "Would assign" if dry_run else "Assigned"
+        for ride_id, driver_id in report['assigned']:
+            self.stdout.write(f"  {label} Ride #{ride_id} -> driver {driver_id}")
@@ -0,0 +1,245 @@
+import numpy as np
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+from users.location_store import location_store
+from tracking.outbox import outbox
+from tracking.push import push_to_users
+from users.models import Profile
+from vehicles.models import Vehicle
+from .dispatch import driver_group_name
+from .models import Ride
+from .utils import distance_matrix
+
+# Pairs at or above this cost are never assigned
+INFEASIBLE = 1e9
+
+# A driver with a ride in one of these states cannot take another
+BUSY_STATUSES = ('ASSIGNED', 'ONGOING')
+
+
+def solve_assignment(cost):
+    """
+    Minimum-cost assignment for a (rows x cols) cost matrix (Hungarian
+    method, shortest augmenting paths). Returns a list of (row, col) pairs
+    covering min(rows, cols) entries.
+    """
+    cost = np.asarray(cost, dtype=np.float64)
+    transposed = cost.shape[0] > cost.shape[1]
+    if transposed:
+        cost = cost.T
+    n, m = cost.shape
+    if n == 0:
+        return []
+
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    match = np.zeros(m + 1, dtype=np.int64)  # column -> row (1-based, 0 = free)
+    way = np.zeros(m + 1, dtype=np.int64)
+
+    for row in range(1, n + 1):
+        match[0] = row
+        col0 = 0
+        min_v = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[col0] = True
+            row0 = match[col0]
+            free = ~used[1:]
+            reduced = cost[row0 - 1] - u[row0] - v[1:]
+            better = free & (reduced < min_v[1:])
+            min_v[1:][better] = reduced[better]
+            way[1:][better] = col0
+            candidates = np.where(free, min_v[1:], np.inf)
+            col1 = int(np.argmin(candidates)) + 1
+            delta = candidates[col1 - 1]
+
+            u[match[used]] += delta
+            v[used] -= delta
+            min_v[1:][free] -= delta
+
+            col0 = col1
+            if match[col0] == 0:
+                break
+        while col0:
+            col1 = way[col0]
+            match[col0] = match[col1]
+            col0 = col1
+
+    pairs = [(int(match[col]) - 1, col - 1) for col in range(1, m + 1) if match[col]]
+    if transposed:
+        pairs = [(col, row) for row, col in pairs]
+    return sorted(pairs)
+
+
+def greedy_assignment(cost):
+    """
+    The current first-come-first-served behaviour: rides in request order
+    each take the nearest driver still free.
+    """
+    taken = set()
+    pairs = []
+    for row in range(cost.shape[0]):
+        order = np.argsort(cost[row])
+        for col in order:
+            if cost[row, col] >= INFEASIBLE:
+                break
+            if col not in taken:
+                taken.add(int(col))
+                pairs.append((row, int(col)))
+                break
+    return pairs
+
+
+class BatchMatcher:
+    """
+    Matches every pending REQUESTED ride against every idle online driver in
+    one pass, minimising the total pickup distance across the fleet.
+    """
+
+    def __init__(self, max_pickup_km=10):
+        self.max_pickup_km = max_pickup_km
+
+    def pending_rides(self):
+        """[(ride_id, lat, lng, requested_vehicle_type_id or None), ...], oldest first."""
+        # Rides waiting on a fare negotiation need the driver's explicit answer
+        return list(
+            Ride.objects.filter(status='REQUESTED', driver__isnull=True, is_scheduled=False)
+            .exclude(negotiation_status='PENDING')
+            .order_by('created_at')
+            .values_list('id', 'pickup_lat', 'pickup_lng', 'requested_vehicle_type_id')
+        )
+
+    def idle_drivers(self):
+        """[(user_id, lat, lng, {active vehicle type ids}), ...] for online drivers without a ride."""
+        busy = Ride.objects.filter(status__in=BUSY_STATUSES, driver__isnull=False).values('driver_id')
+        rows = list(
+            Profile.objects.online_drivers()
+            .exclude(user_id__in=busy)
+            .values_list('user_id', 'current_lat', 'current_lng')
+        )
+        vehicle_types = {}
+        vehicles = Vehicle.objects.filter(driver__user_id__in=[row[0] for row in rows], is_active=True)
+        for user_id, vehicle_type_id in vehicles.values_list('driver__user_id', 'vehicle_type_id'):
+            vehicle_types.setdefault(user_id, set()).add(vehicle_type_id)
+        # Prefer fixes not yet flushed by the write-behind location store
+        return [
+            (user_id,) + (location_store.get(user_id) or (lat, lng)) + (vehicle_types.get(user_id, set()),)
+            for user_id, lat, lng in rows
+        ]
+
+    def cost_matrix(self, rides, drivers):
+        cost = distance_matrix(
+            [r[1] for r in rides], [r[2] for r in rides],
+            [d[1] for d in drivers], [d[2] for d in drivers]
+        )
+        cost[cost > self.max_pickup_km] = INFEASIBLE
+
+        # A ride asking for a vehicle type only goes to drivers with an active
+        # vehicle of that type; there is no one to decline an auto-assignment
+        for i, (_, _, _, vehicle_type_id) in enumerate(rides):
+            if vehicle_type_id is not None:
+                for j, (_, _, _, vehicle_types) in enumerate(drivers):
+                    if vehicle_type_id not in vehicle_types:
+                        cost[i, j] = INFEASIBLE
+
+        ride_index = {ride[0]: i for i, ride in enumerate(rides)}
+        driver_index = {driver[0]: j for j, driver in enumerate(drivers)}
+        rejected = Ride.rejected_drivers.through.objects.filter(
+            ride_id__in=ride_index, user_id__in=driver_index
+        ).values_list('ride_id', 'user_id')
+        for ride_id, user_id in rejected:
+            cost[ride_index[ride_id], driver_index[user_id]] = INFEASIBLE
+        return cost
+
+    def run(self, dry_run=False):
+        """
+        Computes (and unless `dry_run`, applies) the optimal matching.
+        Returns a report comparing it with the greedy behaviour.
+        """
+        rides = self.pending_rides()
+        drivers = self.idle_drivers()
+        report = {
+            'rides': len(rides),
+            'drivers': len(drivers),
+            'matched': 0,
+            'total_pickup_km': 0.0,
+            'greedy_matched': 0,
+            'greedy_pickup_km': 0.0,
+            'assigned': [],
+        }
+        if not rides or not drivers:
+            return report
+
+        cost = self.cost_matrix(rides, drivers)
+        pairs = [(r, d) for r, d in solve_assignment(cost) if cost[r, d] < INFEASIBLE]
+        greedy = greedy_assignment(cost)
+
+        report['matched'] = len(pairs)
+        report['total_pickup_km'] = round(float(sum(cost[r, d] for r, d in pairs)), 3)
+        report['greedy_matched'] = len(greedy)
+        report['greedy_pickup_km'] = round(float(sum(cost[r, d] for r, d in greedy)), 3)
+
+        assignments = {rides[r][0]: drivers[d][0] for r, d in pairs}
+        if dry_run:
+            report['assigned'] = sorted(assignments.items())
+        else:
+            report['assigned'] = self.apply(assignments)
+        return report
+
+    def apply(self, assignments):
+        """
+        Assigns all matched rides with one conditional UPDATE, then reads back
+        the winners. Rides taken meanwhile by a manual ACCEPT are skipped, and
+        so are pairs whose driver accepted another ride since the snapshot.
+        """
+        if not assignments:
+            return []
+
+        driver_free = models.Q()
+        for ride_id, driver_id in assignments.items():
+            busy = Ride.objects.filter(driver_id=driver_id, status__in=BUSY_STATUSES)
+            driver_free |= models.Q(pk=ride_id) & ~models.Exists(busy)
+
+        Ride.objects.filter(driver_free, status='REQUESTED', driver__isnull=True).update(
+            driver_id=models.Case(
+                *[models.When(pk=ride_id, then=models.Value(driver_id)) for ride_id, driver_id in assignments.items()],
+                output_field=models.IntegerField()
+            ),
+            status='ASSIGNED',
+            updated_at=timezone.now()  # update() skips auto_now
+        )
+
+        won = list(
+            Ride.objects.filter(pk__in=assignments, status='ASSIGNED')
+            .select_related('driver', 'rider')
+        )
+        won = [ride for ride in won if ride.driver_id == assignments[ride.id]]
+        self.notify(won)
+        return sorted((ride.id, ride.driver_id) for ride in won)
+
+    def notify(self, rides):
+        from .serializers import RideSerializer
+
+        for ride in rides:
+            update = {
+                'status': ride.status,
+                'ride_id': ride.id,
+                'amount_paid': str(ride.estimated_fare) if ride.estimated_fare else None,
+                'driver_name': ride.driver.username,
+                'driver_id': ride.driver_id,
+                'rider_id': ride.rider.id if ride.rider else None,
+                'rider_username': ride.rider.username if ride.rider else None,
+            }
+            assigned = {
+                'type': 'ride_assigned',
+                'ride': RideSerializer(ride).data
+            }
+            outbox.publish(f'ride_{ride.id}', {'type': 'ride_status_update', **update})
+            outbox.publish(driver_group_name(ride.driver_id), assigned)
+            push_to_users([ride.rider_id], {'type': 'status_update', **update})
+            push_to_users([ride.driver_id], assigned)
+
+
+matcher = BatchMatcher(max_pickup_km=getattr(settings, 'MATCHING_MAX_PICKUP_KM', 10))
@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-18 06:35
+
+from django.db import migrations, models
+
+
+def populate_pickup_geohash(apps, schema_editor):
+    from rides.geo import encode_geohash
+
+    Ride = apps.get_model("rides", "Ride")
+    rides = list(Ride.objects.only("id", "pickup_lat", "pickup_lng"))
+    for ride in rides:
+        ride.pickup_geohash = encode_geohash(ride.pickup_lat, ride.pickup_lng)
+    Ride.objects.bulk_update(rides, ["pickup_geohash"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("rides", "0009_ride_negotiation_status_ride_proposed_fare_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ride",
+            name="pickup_geohash",
+            field=models.CharField(blank=True, db_index=True, max_length=12, null=True),
+        ),
+        migrations.RunPython(populate_pickup_geohash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 6.0 on 2026-10-18 07:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("rides", "0010_ride_pickup_geohash"),
+        ("vehicles", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="chatmessage",
+            index=models.Index(fields=["ride", "timestamp", "id"], name="chat_ride_timestamp_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="ride",
+            index=models.Index(fields=["status", "driver"], name="ride_status_driver_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="ride",
+            index=models.Index(fields=["rider", "created_at", "id"], name="ride_rider_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="ride",
+            index=models.Index(fields=["driver", "created_at", "id"], name="ride_driver_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="ride",
+            index=models.Index(condition=models.Q(("is_scheduled", True)), fields=["scheduled_datetime", "available_seats"], name="ride_scheduled_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="ride",
+            index=models.Index(condition=models.Q(("status__in", ["REQUESTED", "ASSIGNED", "ONGOING"])), fields=["status", "created_at"], name="ride_active_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="scheduledriderequest",
+            index=models.Index(fields=["passenger", "created_at", "id"], name="seatreq_passenger_created_idx"),
+        ),
+    ]
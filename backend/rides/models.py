@@ -1,6 +1,30 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from .geo import GeoQuerySet, encode_geohash
+
+# Statuses of rides still in play (requested, assigned or under way)
+ACTIVE_RIDE_STATUSES = ['REQUESTED', 'ASSIGNED', 'ONGOING']
+
+class RideQuerySet(GeoQuerySet):
+    lat_field = 'pickup_lat'
+    lng_field = 'pickup_lng'
+    geohash_field = 'pickup_geohash'
+
+    def for_serializer(self, user=None):
+        """
+        Loads what RideSerializer reads in the same query: driver and rider
+        with their profiles, and (for a signed-in `user`) their seat request
+        status on each ride as `viewer_request_status`.
+        """
+        rides = self.select_related('driver__profile', 'rider__profile')
+        if user is not None and user.is_authenticated:
+            rides = rides.annotate(viewer_request_status=models.Subquery(
+                ScheduledRideRequest.objects.filter(
+                    ride=models.OuterRef('pk'), passenger=user
+                ).values('status')[:1]
+            ))
+        return rides
 
 class Ride(models.Model):
     STATUS_CHOICES = [
@@ -20,6 +44,8 @@ class Ride(models.Model):
     pickup_lat = models.DecimalField(max_digits=22, decimal_places=16)
     pickup_lng = models.DecimalField(max_digits=22, decimal_places=16)
     pickup_address = models.TextField(null=True, blank=True)
+    # Cell of the pickup point, kept in sync on save, for proximity prefilters
+    pickup_geohash = models.CharField(max_length=12, null=True, blank=True, db_index=True)
     
     drop_lat = models.DecimalField(max_digits=22, decimal_places=16)
     drop_lng = models.DecimalField(max_digits=22, decimal_places=16)
@@ -61,9 +87,62 @@ class Ride(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = RideQuerySet.as_manager()
+
+    class Meta:
+        # Checked against the hot queries by `manage.py check_query_plans`
+        indexes = [
+            models.Index(fields=['status', 'driver'], name='ride_status_driver_idx'),
+            # History and keyset pages: (-created_at, -id) per participant
+            models.Index(fields=['rider', 'created_at', 'id'], name='ride_rider_created_idx'),
+            models.Index(fields=['driver', 'created_at', 'id'], name='ride_driver_created_idx'),
+            # Partial on is_scheduled: a bare boolean term can't seek a composite index on SQLite
+            models.Index(
+                fields=['scheduled_datetime', 'available_seats'],
+                condition=models.Q(is_scheduled=True),
+                name='ride_scheduled_idx'
+            ),
+            # Small: finished and cancelled rides, the bulk of the table, are left out
+            models.Index(
+                fields=['status', 'created_at'],
+                condition=models.Q(status__in=ACTIVE_RIDE_STATUSES),
+                name='ride_active_idx'
+            ),
+        ]
+
     def __str__(self):
         return f"Ride #{self.id} - {self.status}"
 
+    # Allowed status changes, enforced by clean() and transition()
+    STRICT_TRANSITIONS = {
+        'REQUESTED': ['ASSIGNED', 'CANCELLED'],
+        'ASSIGNED': ['ONGOING', 'COMPLETED', 'CANCELLED'],
+        'ONGOING': ['COMPLETED', 'CANCELLED'],
+        'COMPLETED': ['PAID', 'FINISHED'], # Allow direct transition for cash payments
+        'CANCELLED': [],
+        'PAID': ['FINISHED'],
+        'FINISHED': []
+    }
+    # Loaded values clean() compares against, kept so saves need no extra SELECT
+    TRACKED_FIELDS = ('status', 'pickup_lat', 'pickup_lng', 'drop_lat', 'drop_lng', 'estimated_fare', 'distance_km')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_original()
+        return instance
+
+    def _remember_original(self):
+        self._original = {f: self.__dict__[f] for f in self.TRACKED_FIELDS if f in self.__dict__}
+
+    def _original_values(self):
+        original = getattr(self, '_original', None)
+        if original is None or len(original) < len(self.TRACKED_FIELDS):
+            # Built by hand or loaded with deferred fields
+            original = Ride.objects.filter(pk=self.pk).values(*self.TRACKED_FIELDS).get()
+            self._original = original
+        return original
+
     def clean(self):
         from django.utils import timezone
         if self.is_scheduled:
@@ -80,36 +159,26 @@ class Ride(models.Model):
 
         # Strict state transition validation
         if self.pk:
-            old_instance = Ride.objects.get(pk=self.pk)
-            old_status = old_instance.status
+            old_instance = self._original_values()
+            old_status = old_instance['status']
             new_status = self.status
 
             if old_status in ['COMPLETED', 'PAID']:
                 # Prevent modification of critical fields
                 if (
-                    self.pickup_lat != old_instance.pickup_lat or
-                    self.pickup_lng != old_instance.pickup_lng or
-                    self.drop_lat != old_instance.drop_lat or
-                    self.drop_lng != old_instance.drop_lng or
-                    self.estimated_fare != old_instance.estimated_fare or
-                    self.distance_km != old_instance.distance_km
+                    self.pickup_lat != old_instance['pickup_lat'] or
+                    self.pickup_lng != old_instance['pickup_lng'] or
+                    self.drop_lat != old_instance['drop_lat'] or
+                    self.drop_lng != old_instance['drop_lng'] or
+                    self.estimated_fare != old_instance['estimated_fare'] or
+                    self.distance_km != old_instance['distance_km']
                 ):
                      raise ValidationError("Cannot modify ride details after completion")
 
             if old_status == new_status:
                 return
 
-            strict_transitions = {
-                'REQUESTED': ['ASSIGNED', 'CANCELLED'],
-                'ASSIGNED': ['ONGOING', 'COMPLETED', 'CANCELLED'],
-                'ONGOING': ['COMPLETED', 'CANCELLED'],
-                'COMPLETED': ['PAID', 'FINISHED'], # Allow direct transition for cash payments
-                'CANCELLED': [],
-                'PAID': ['FINISHED'],
-                'FINISHED': []
-            }
-
-            if new_status != old_status and new_status not in strict_transitions.get(old_status, []):
+            if new_status != old_status and new_status not in self.STRICT_TRANSITIONS.get(old_status, []):
                  raise ValidationError(f"Invalid state transition from {old_status} to {new_status}")
                  
             if new_status == 'ASSIGNED' and not self.driver:
@@ -117,30 +186,76 @@ class Ride(models.Model):
 
     def save(self, *args, **kwargs):
         self.clean()
+        self.pickup_geohash = encode_geohash(self.pickup_lat, self.pickup_lng)
         is_new = self.pk is None
         old_status = None
         if not is_new:
-            old_status = Ride.objects.get(pk=self.pk).status
+            old_status = self._original_values()['status']
         
-        super().save(*args, **kwargs)
+        if is_new:
+            super().save(*args, **kwargs)
+        else:
+            with transaction.atomic():
+                # Writing the row first locks it, and only while its status is
+                # still the one clean() validated: a stale instance cannot undo
+                # a concurrent transition() by saving every column back
+                if not Ride.objects.filter(pk=self.pk, status=old_status).update(status=old_status):
+                    raise ValidationError("Ride was changed by another request; reload it and try again.")
+                super().save(*args, **kwargs)
+        self._remember_original()
         
         # Notify about status change
         if is_new or old_status != self.status:
-            from asgiref.sync import async_to_sync
-            from channels.layers import get_channel_layer
-            channel_layer = get_channel_layer()
-            async_to_sync(channel_layer.group_send)(
-                f'ride_{self.id}',
-                {
-                    'type': 'ride_status_update',
-                    'status': self.status,
-                    'ride_id': self.id,
-                    'amount_paid': str(self.estimated_fare) if self.estimated_fare else None, # Assuming estimated_fare is the amount paid for broadcast
-                    'driver_name': self.driver.username if self.driver else None,
-                    'rider_id': self.rider.id if self.rider else None,
-                    'rider_username': self.rider.username if self.rider else None,
-                }
-            )
+            self.notify_status_change()
+
+    @classmethod
+    def transition(cls, pk, from_states, to_state, **fields):
+        """
+        Compare-and-swap status change: one conditional UPDATE moving ride
+        `pk` to `to_state` only while its status is still in `from_states`
+        (None = every state allowed to reach `to_state`). `fields` are set in
+        the same statement and may be expressions. Returns the updated ride
+        (driver and rider profiles joined) after notifying its participants, or None
+        when another request changed the ride first.
+        """
+        from django.utils import timezone
+        allowed = [state for state, targets in cls.STRICT_TRANSITIONS.items() if to_state in targets]
+        from_states = allowed if from_states is None else list(from_states)
+        invalid = sorted(set(from_states) - set(allowed))
+        if invalid:
+            raise ValidationError(f"Invalid state transition from {', '.join(invalid)} to {to_state}")
+
+        rides = cls.objects.filter(pk=pk, status__in=from_states)
+        if to_state == 'ASSIGNED':
+            if 'driver' in fields or 'driver_id' in fields:
+                if fields.get('driver', fields.get('driver_id')) is None:
+                    raise ValidationError("Cannot move to ASSIGNED without a driver.")
+            else:
+                rides = rides.filter(driver__isnull=False)
+
+        # update() skips auto_now, so updated_at is set explicitly
+        if not rides.update(status=to_state, updated_at=timezone.now(), **fields):
+            return None
+        ride = cls.objects.for_serializer().get(pk=pk)
+        ride.notify_status_change()
+        return ride
+
+    def notify_status_change(self):
+        # Sent once the current transaction commits, never for a rolled back change
+        from tracking.outbox import outbox
+        from tracking.push import push_to_users
+        update = {
+            'status': self.status,
+            'ride_id': self.id,
+            'amount_paid': str(self.estimated_fare) if self.estimated_fare else None, # Assuming estimated_fare is the amount paid for broadcast
+            'driver_name': self.driver.username if self.driver else None,
+            'driver_id': self.driver_id,
+            'rider_id': self.rider.id if self.rider else None,
+            'rider_username': self.rider.username if self.rider else None,
+        }
+        outbox.publish(f'ride_{self.id}', {'type': 'ride_status_update', **update})
+        # Same update on the participants' personal sockets (ws/me/)
+        push_to_users([self.rider_id, self.driver_id], {'type': 'status_update', **update})
 
 class ScheduledRideRequest(models.Model):
     STATUS_CHOICES = [
@@ -159,6 +274,9 @@ class ScheduledRideRequest(models.Model):
 
     class Meta:
         unique_together = ('ride', 'passenger')
+        indexes = [
+            models.Index(fields=['passenger', 'created_at', 'id'], name='seatreq_passenger_created_idx'),
+        ]
 
     def __str__(self):
         return f"Request by {self.passenger.username} for Ride #{self.ride.id} - {self.status}"
@@ -172,6 +290,9 @@ class ChatMessage(models.Model):
 
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            models.Index(fields=['ride', 'timestamp', 'id'], name='chat_ride_timestamp_idx'),
+        ]
 
     def __str__(self):
         return f"From {self.sender.username} to {self.receiver.username} on Ride {self.ride.id}"
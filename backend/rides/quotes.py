@@ -0,0 +1,107 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from vehicles.rates import rate_table
+from .routing import estimate_trip
+from .utils import calculate_fare
+
+METERS_PER_DEGREE = 111320
+
+
+class FareQuoteCache:
+    """
+    Memo cache for fare estimates.
+
+    Pickup and drop points are snapped to a grid of roughly `grid_meters`
+    so the stream of requests sent while a rider drags a map pin collapses
+    onto a handful of keys. Every point in a cell gets the quote computed
+    for the cell's centre. Entries expire after `ttl` seconds and the
+    least recently used ones are evicted beyond `max_entries`.
+    """
+
+    def __init__(self, max_entries=10000, ttl=300, grid_meters=20):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.step = grid_meters / METERS_PER_DEGREE
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (expires_at, quote)
+        self._lock = threading.Lock()
+
+    def _snap(self, value):
+        return round(float(value) / self.step)
+
+    def quote(self, pickup_lat, pickup_lng, drop_lat, drop_lng, vehicle_type_id=None):
+        """
+        Returns {"distance_km", "duration_min", "estimated_fare"}. Unknown
+        vehicle types are priced with the default rates.
+        """
+        rate = rate_table.get(vehicle_type_id) if vehicle_type_id else None
+        cells = tuple(self._snap(v) for v in (pickup_lat, pickup_lng, drop_lat, drop_lng))
+        key = cells + (rate.id if rate else None, rate_table.version)
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(entry[1])
+            self.misses += 1
+
+        quote = self._compute(*(cell * self.step for cell in cells), rate)
+
+        with self._lock:
+            self._entries[key] = (now + self.ttl, quote)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return dict(quote)
+
+    @staticmethod
+    def _compute(pickup_lat, pickup_lng, drop_lat, drop_lng, rate):
+        distance_km, duration_min = estimate_trip(pickup_lat, pickup_lng, drop_lat, drop_lng)
+        if rate:
+            fare = calculate_fare(
+                distance_km,
+                base_fare=rate.base_fare,
+                per_km_rate=rate.per_km_rate,
+                per_minute_rate=rate.per_minute_rate,
+                duration_minutes=duration_min
+            )
+        else:
+            fare = calculate_fare(distance_km) # Uses defaults
+        return {
+            "distance_km": round(distance_km, 2),
+            "duration_min": round(duration_min, 1),
+            "estimated_fare": fare
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "rate_table_version": rate_table.version,
+        }
+
+
+fare_quotes = FareQuoteCache(
+    max_entries=getattr(settings, 'FARE_QUOTE_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'FARE_QUOTE_TTL', 300),
+    grid_meters=getattr(settings, 'FARE_QUOTE_GRID_METERS', 20),
+)
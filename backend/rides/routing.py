@@ -0,0 +1,383 @@
+import heapq
+import math
+import os
+import threading
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+from .utils import calculate_distance, distances_from, pairwise_distances
+
+# Typical speeds (km/h) on Rajbari district roads by OSM highway class.
+# `*_link` roads use the speed of their parent class.
+ROAD_SPEEDS_KMH = {
+    'motorway': 60,
+    'trunk': 50,
+    'primary': 40,
+    'secondary': 35,
+    'tertiary': 30,
+    'unclassified': 25,
+    'residential': 20,
+    'living_street': 10,
+    'service': 15,
+    'track': 15,
+    'road': 20,
+}
+
+# Speed used for the straight-line hop between a point and its nearest road node
+SNAP_SPEED_KMH = 15
+
+
+def road_speed(tags):
+    highway = tags.get('highway', '')
+    base = highway[:-5] if highway.endswith('_link') else highway
+    speed = ROAD_SPEEDS_KMH.get(base)
+    if speed is None:
+        return None
+    maxspeed = tags.get('maxspeed', '').split(' ')[0]
+    if maxspeed.isdigit():
+        speed = min(speed, int(maxspeed))
+    return speed
+
+
+def _csr(count, sources, targets, *weights):
+    """Compressed sparse rows: offsets[n]..offsets[n+1] index the edges out of node n."""
+    order = np.argsort(sources, kind='stable')
+    offsets = np.zeros(count + 1, dtype=np.int64)
+    np.add.at(offsets, np.asarray(sources) + 1, 1)
+    return (np.cumsum(offsets), np.asarray(targets)[order]) + tuple(np.asarray(w)[order] for w in weights)
+
+
+class RoadGraph:
+    """
+    Directed road graph in CSR arrays, weighted by travel time, with
+    ALT (A*, landmarks and triangle inequality) distances precomputed so
+    point-to-point queries only explore a narrow corridor of the network.
+    """
+
+    ARRAYS = [
+        'lat', 'lng', 'offsets', 'targets', 'lengths', 'times',
+        'rev_offsets', 'rev_targets', 'rev_times', 'from_landmarks', 'to_landmarks',
+    ]
+
+    def __init__(self, **arrays):
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self.node_count = len(self.lat)
+        # Plain lists are much faster than NumPy scalars inside the search loops
+        self._offsets = self.offsets.tolist()
+        self._targets = self.targets.tolist()
+        self._lengths = self.lengths.tolist()
+        self._times = self.times.tolist()
+        self._rev_offsets = self.rev_offsets.tolist()
+        self._rev_targets = self.rev_targets.tolist()
+        self._rev_times = self.rev_times.tolist()
+
+    # --- Building ---
+
+    @classmethod
+    def from_osm(cls, path, landmark_count=8):
+        """Parses an OSM XML extract and builds the routable graph."""
+        coords = {}
+        ways = []
+        for _, elem in ET.iterparse(path, events=('end',)):
+            if elem.tag == 'node':
+                coords[int(elem.get('id'))] = (float(elem.get('lat')), float(elem.get('lon')))
+                elem.clear()
+            elif elem.tag == 'way':
+                tags = {tag.get('k'): tag.get('v') for tag in elem.iter('tag')}
+                speed = road_speed(tags)
+                if speed:
+                    refs = [int(nd.get('ref')) for nd in elem.iter('nd')]
+                    oneway = tags.get('oneway', 'no')
+                    if tags.get('junction') == 'roundabout' and oneway == 'no':
+                        oneway = 'yes'
+                    ways.append((refs, speed, oneway))
+                elem.clear()
+
+        index = {}
+        sources, targets, speeds = [], [], []
+        for refs, speed, oneway in ways:
+            refs = [ref for ref in refs if ref in coords]
+            for a, b in zip(refs, refs[1:]):
+                a = index.setdefault(a, len(index))
+                b = index.setdefault(b, len(index))
+                if oneway in ('yes', 'true', '1'):
+                    pairs = [(a, b)]
+                elif oneway == '-1':
+                    pairs = [(b, a)]
+                else:
+                    pairs = [(a, b), (b, a)]
+                for u, v in pairs:
+                    sources.append(u)
+                    targets.append(v)
+                    speeds.append(speed)
+
+        lat = np.zeros(len(index))
+        lng = np.zeros(len(index))
+        for osm_id, i in index.items():
+            lat[i], lng[i] = coords[osm_id]
+
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        lengths = pairwise_distances(lat[sources], lng[sources], lat[targets], lng[targets])
+        times = lengths / np.asarray(speeds, dtype=np.float64) * 60  # minutes
+
+        offsets, csr_targets, csr_lengths, csr_times = _csr(len(index), sources, targets, lengths, times)
+        rev_offsets, rev_targets, rev_times = _csr(len(index), targets, sources, times)
+
+        graph = cls(
+            lat=lat, lng=lng,
+            offsets=offsets, targets=csr_targets, lengths=csr_lengths, times=csr_times,
+            rev_offsets=rev_offsets, rev_targets=rev_targets, rev_times=rev_times,
+            from_landmarks=np.zeros((0, len(index))), to_landmarks=np.zeros((0, len(index))),
+        )
+        graph.select_landmarks(landmark_count)
+        return graph
+
+    def select_landmarks(self, count):
+        """Farthest-point landmark selection, storing travel times from and to each landmark."""
+        if self.node_count == 0:
+            return
+        from_landmarks, to_landmarks = [], []
+        landmark = 0
+        chosen = []
+        reach = np.zeros(self.node_count)
+        for _ in range(min(count, self.node_count)):
+            chosen.append(landmark)
+            forward = self._dijkstra_all(landmark, reverse=False)
+            from_landmarks.append(forward)
+            to_landmarks.append(self._dijkstra_all(landmark, reverse=True))
+            reach += np.where(np.isfinite(forward), forward, 0)
+            reach[chosen] = -np.inf
+            landmark = int(np.argmax(reach))
+        self.from_landmarks = np.asarray(from_landmarks)
+        self.to_landmarks = np.asarray(to_landmarks)
+
+    def _dijkstra_all(self, source, reverse=False):
+        offsets, targets, times = (
+            (self._rev_offsets, self._rev_targets, self._rev_times) if reverse
+            else (self._offsets, self._targets, self._times)
+        )
+        dist = [math.inf] * self.node_count
+        dist[source] = 0.0
+        heap = [(0.0, source)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            for e in range(offsets[u], offsets[u + 1]):
+                v = targets[e]
+                nd = d + times[e]
+                if nd < dist[v]:
+                    dist[v] = nd
+                    heapq.heappush(heap, (nd, v))
+        return np.asarray(dist)
+
+    # --- Persistence ---
+
+    def save(self, path):
+        np.savez_compressed(path, **{name: getattr(self, name) for name in self.ARRAYS})
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(**{name: data[name] for name in cls.ARRAYS})
+
+    # --- Queries ---
+
+    def nearest_node(self, lat, lng):
+        """(node, distance_km) of the road node closest to a point."""
+        distances = distances_from(lat, lng, self.lat, self.lng)
+        node = int(np.argmin(distances))
+        return node, float(distances[node])
+
+    def _heuristic(self, target):
+        """Lower bounds on travel time from every node to `target` (ALT)."""
+        if not len(self.from_landmarks):
+            return [0.0] * self.node_count
+        with np.errstate(invalid='ignore'):
+            forward = self.from_landmarks[:, [target]] - self.from_landmarks
+            backward = self.to_landmarks - self.to_landmarks[:, [target]]
+            bounds = np.fmax(forward, backward)
+        bounds = np.where(np.isfinite(bounds), bounds, 0.0)
+        return np.maximum(bounds.max(axis=0), 0.0).tolist()
+
+    def route(self, source, target):
+        """
+        Fastest path between two nodes by A* with landmark bounds.
+        Returns (distance_km, duration_min), or None when unreachable.
+        """
+        if source == target:
+            return 0.0, 0.0
+        h = self._heuristic(target)
+        offsets, targets, lengths, times = self._offsets, self._targets, self._lengths, self._times
+        best = {source: 0.0}
+        length = {source: 0.0}
+        heap = [(h[source], 0.0, source)]
+        while heap:
+            _, d, u = heapq.heappop(heap)
+            if u == target:
+                return length[u], d
+            if d > best[u]:
+                continue
+            for e in range(offsets[u], offsets[u + 1]):
+                v = targets[e]
+                nd = d + times[e]
+                if nd < best.get(v, math.inf):
+                    best[v] = nd
+                    length[v] = length[u] + lengths[e]
+                    heapq.heappush(heap, (nd + h[v], nd, v))
+        return None
+
+    def one_to_many(self, source, targets):
+        """
+        Dijkstra from `source` until every node in `targets` is settled.
+        Returns {target: (distance_km, duration_min)} for the reachable ones.
+        """
+        pending = set(targets)
+        results = {}
+        offsets, csr_targets, lengths, times = self._offsets, self._targets, self._lengths, self._times
+        best = {source: 0.0}
+        length = {source: 0.0}
+        heap = [(0.0, source)]
+        while heap and pending:
+            d, u = heapq.heappop(heap)
+            if d > best[u]:
+                continue
+            if u in pending:
+                pending.discard(u)
+                results[u] = (length[u], d)
+            for e in range(offsets[u], offsets[u + 1]):
+                v = csr_targets[e]
+                nd = d + times[e]
+                if nd < best.get(v, math.inf):
+                    best[v] = nd
+                    length[v] = length[u] + lengths[e]
+                    heapq.heappush(heap, (nd, v))
+        return results
+
+
+class Router:
+    """
+    Point-to-point and many-to-many road distance/ETA on a RoadGraph.
+    Points are snapped to their nearest road node; node-to-node results are
+    kept in an LRU cache shared by both query modes.
+    """
+
+    def __init__(self, graph, cache_size=50000):
+        self.graph = graph
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # (source_node, target_node) -> (km, min) or None
+        self._lock = threading.Lock()
+
+    def _cached(self, key):
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return True, self._cache[key]
+        return False, None
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._cache[key] = value
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    @staticmethod
+    def _with_snaps(result, snap_km):
+        distance, duration = result
+        return distance + snap_km, duration + snap_km / SNAP_SPEED_KMH * 60
+
+    def route(self, lat1, lng1, lat2, lng2):
+        """(distance_km, duration_min) by road, or None when no road connects the points."""
+        source, snap1 = self.graph.nearest_node(lat1, lng1)
+        target, snap2 = self.graph.nearest_node(lat2, lng2)
+        key = (source, target)
+        hit, result = self._cached(key)
+        if not hit:
+            result = self.graph.route(source, target)
+            self._remember(key, result)
+        if result is None:
+            return None
+        return self._with_snaps(result, snap1 + snap2)
+
+    def matrix(self, sources, targets):
+        """
+        Many-to-many mode for dispatch: `sources` and `targets` are lists of
+        (lat, lng). Returns (distance_km, duration_min) arrays of shape
+        (len(sources), len(targets)); unreachable pairs are inf.
+        """
+        source_nodes = [self.graph.nearest_node(lat, lng) for lat, lng in sources]
+        target_nodes = [self.graph.nearest_node(lat, lng) for lat, lng in targets]
+        distance = np.full((len(sources), len(targets)), np.inf)
+        duration = np.full((len(sources), len(targets)), np.inf)
+
+        for i, (source, snap1) in enumerate(source_nodes):
+            missing = set()
+            found = {}
+            for target, _ in target_nodes:
+                hit, result = self._cached((source, target))
+                if hit:
+                    found[target] = result
+                else:
+                    missing.add(target)
+            if missing:
+                computed = self.graph.one_to_many(source, missing)
+                for target in missing:
+                    found[target] = computed.get(target)
+                    self._remember((source, target), found[target])
+            for j, (target, snap2) in enumerate(target_nodes):
+                if found[target] is not None:
+                    distance[i, j], duration[i, j] = self._with_snaps(found[target], snap1 + snap2)
+        return distance, duration
+
+
+def load_router(osm_path):
+    """
+    Builds a Router from an OSM extract. The compiled graph is cached next
+    to the extract (`<path>.graph.npz`) and rebuilt when the extract changes.
+    """
+    compiled = f'{osm_path}.graph.npz'
+    if os.path.exists(compiled) and os.path.getmtime(compiled) >= os.path.getmtime(osm_path):
+        graph = RoadGraph.load(compiled)
+    else:
+        graph = RoadGraph.from_osm(osm_path)
+        try:
+            graph.save(compiled)
+        except OSError:
+            pass  # Read-only deploys just rebuild on start
+    return Router(graph, cache_size=getattr(settings, 'ROUTING_CACHE_SIZE', 50000))
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router():
+    """The process-wide Router, or None when no OSM extract is configured/present."""
+    global _router
+    if _router is None:
+        path = getattr(settings, 'ROUTING_OSM_PATH', None)
+        if not path or not os.path.exists(path):
+            return None
+        with _router_lock:
+            if _router is None:
+                _router = load_router(str(path))
+    return _router
+
+
+def estimate_trip(pickup_lat, pickup_lng, drop_lat, drop_lng):
+    """
+    (distance_km, duration_min) for a trip: by road when the routing graph is
+    available, otherwise straight-line distance with no duration estimate.
+    """
+    router = get_router()
+    if router is not None:
+        result = router.route(float(pickup_lat), float(pickup_lng), float(drop_lat), float(drop_lng))
+        if result is not None:
+            return result
+    return calculate_distance(pickup_lat, pickup_lng, drop_lat, drop_lng), 0
@@ -76,7 +76,7 @@ class RideSerializer(serializers.ModelSerializer):
         ]
 
     def get_ride_type(self, obj):
-        if obj.driver:
+        if obj.driver_id:
             return 'OFFER'
         return 'REQUEST'
 
@@ -85,8 +85,11 @@ class RideSerializer(serializers.ModelSerializer):
         if not request or not hasattr(request, 'user') or not request.user.is_authenticated:
             return None
         
-        req = ScheduledRideRequest.objects.filter(ride=obj, passenger=request.user).first()
-        return req.status if req else None
+        # Annotated by Ride.objects.for_serializer(); looked up (once) otherwise
+        if not hasattr(obj, 'viewer_request_status'):
+            req = ScheduledRideRequest.objects.filter(ride=obj, passenger=request.user).first()
+            obj.viewer_request_status = req.status if req else None
+        return obj.viewer_request_status
 
     creator_phone = serializers.SerializerMethodField()
 
@@ -95,14 +98,24 @@ class RideSerializer(serializers.ModelSerializer):
         if not request or not hasattr(request, 'user') or not request.user.is_authenticated:
             return None
         
-        # Only show phone if they have an APPROVED request
-        has_approved = ScheduledRideRequest.objects.filter(ride=obj, passenger=request.user, status='APPROVED').exists()
-        if not has_approved:
+        # Only show phone if they have an APPROVED request (one request per passenger and ride)
+        if self.get_user_request_status(obj) != 'APPROVED':
             return None
             
         creator = obj.driver if obj.driver else obj.rider
         return creator.profile.phone_number if creator and hasattr(creator, 'profile') else None
 
+class AvailableRideSerializer(RideSerializer):
+    # Annotated by Ride.objects.near(); None when the driver has no position
+    pickup_distance_km = serializers.SerializerMethodField()
+
+    class Meta(RideSerializer.Meta):
+        fields = RideSerializer.Meta.fields + ['pickup_distance_km']
+
+    def get_pickup_distance_km(self, obj):
+        distance = getattr(obj, 'distance', None)
+        return round(distance, 2) if distance is not None else None
+
 class ScheduledRideRequestSerializer(serializers.ModelSerializer):
     passenger_username = serializers.CharField(source='passenger.username', read_only=True)
     passenger_phone = serializers.SerializerMethodField()
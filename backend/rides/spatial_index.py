@@ -0,0 +1,180 @@
+import math
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Q
+
+from .utils import calculate_distance
+
+KM_PER_DEGREE = 111.32
+
+
+class DriverSpatialIndex:
+    """
+    Process-level uniform grid of online driver positions.
+
+    Drivers are bucketed into square cells (in degrees) so nearest-driver and
+    radius queries only look at the cells around the pickup point instead of
+    every online driver. The grid is kept current by the location/online
+    views and the ride consumer, and is rebuilt from the database every
+    `refresh_interval` seconds to pick up changes made by other processes.
+    """
+
+    def __init__(self, cell_size_km=1.0, refresh_interval=30):
+        self.cell_deg = cell_size_km / KM_PER_DEGREE
+        self.refresh_interval = refresh_interval
+        self._cells = defaultdict(dict)  # (row, col) -> {user_id: (lat, lng)}
+        self._positions = {}  # user_id -> (lat, lng, cell)
+        self._lock = threading.RLock()
+        self._loaded_at = None
+
+    def _cell(self, lat, lng):
+        return (math.floor(lat / self.cell_deg), math.floor(lng / self.cell_deg))
+
+    def __len__(self):
+        return len(self._positions)
+
+    def update(self, user_id, lat, lng):
+        lat, lng = float(lat), float(lng)
+        cell = self._cell(lat, lng)
+        with self._lock:
+            old = self._positions.get(user_id)
+            if old and old[2] != cell:
+                self._discard_from_cell(user_id, old[2])
+            self._cells[cell][user_id] = (lat, lng)
+            self._positions[user_id] = (lat, lng, cell)
+
+    def remove(self, user_id):
+        with self._lock:
+            old = self._positions.pop(user_id, None)
+            if old:
+                self._discard_from_cell(user_id, old[2])
+
+    def _discard_from_cell(self, user_id, cell):
+        bucket = self._cells.get(cell)
+        if bucket is not None:
+            bucket.pop(user_id, None)
+            if not bucket:
+                del self._cells[cell]
+
+    def sync_profile(self, profile):
+        """Adds, moves or drops a user based on their profile's current state."""
+        if (
+            profile.role == 'DRIVER' and profile.is_online and
+            profile.current_lat is not None and profile.current_lng is not None
+        ):
+            self.update(profile.user_id, profile.current_lat, profile.current_lng)
+        else:
+            self.remove(profile.user_id)
+
+    def get(self, user_id):
+        pos = self._positions.get(user_id)
+        return (pos[0], pos[1]) if pos else None
+
+    def reload(self):
+        """
+        Rebuilds the grid from the online drivers stored in the database,
+        keeping this process's fixes that are newer than their rows.
+        """
+        from users.location_store import location_store
+        from users.models import Profile
+
+        # Taken before the query: a fix flushed in between is then in one or the other
+        unflushed = location_store.unflushed()
+        # Drivers whose first fix is still unflushed have no position in their row yet
+        rows = list(
+            Profile.objects.filter(role='DRIVER', is_online=True)
+            .filter(Q(current_lat__isnull=False, current_lng__isnull=False) | Q(user_id__in=unflushed))
+            .values_list('user_id', 'current_lat', 'current_lng')
+        )
+
+        with self._lock:
+            self._cells.clear()
+            self._positions.clear()
+            for user_id, lat, lng in rows:
+                self.update(user_id, *unflushed.get(user_id, (lat, lng)))
+            self._loaded_at = time.monotonic()
+
+    def ensure_loaded(self):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_interval:
+            self.reload()
+
+    def _scan(self, lat, lng, exclude, max_radius_km, enough):
+        """
+        Walks the grid in square rings around (lat, lng), collecting
+        (distance_km, user_id) pairs until `enough(found, covered_km)` says the
+        remaining rings cannot contain anything closer.
+        """
+        self.ensure_loaded()
+        lat, lng = float(lat), float(lng)
+        row, col = self._cell(lat, lng)
+        # Narrowest side of a cell at this latitude; a point outside ring r is
+        # at least r cell widths away from the query point.
+        cell_km = self.cell_deg * KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01)
+
+        found = []
+        with self._lock:
+            remaining = len(self._positions)
+            ring = 0
+            while remaining > 0:
+                covered_km = ring * cell_km
+                if max_radius_km is not None and covered_km > max_radius_km + cell_km:
+                    break
+                for cell in self._ring_cells(row, col, ring):
+                    bucket = self._cells.get(cell)
+                    if not bucket:
+                        continue
+                    remaining -= len(bucket)
+                    for user_id, (d_lat, d_lng) in bucket.items():
+                        if user_id in exclude:
+                            continue
+                        dist = calculate_distance(lat, lng, d_lat, d_lng)
+                        if max_radius_km is None or dist <= max_radius_km:
+                            found.append((dist, user_id))
+                if enough(found, covered_km):
+                    break
+                ring += 1
+
+        found.sort()
+        return found
+
+    @staticmethod
+    def _ring_cells(row, col, ring):
+        if ring == 0:
+            yield (row, col)
+            return
+        for c in range(col - ring, col + ring + 1):
+            yield (row - ring, c)
+            yield (row + ring, c)
+        for r in range(row - ring + 1, row + ring):
+            yield (r, col - ring)
+            yield (r, col + ring)
+
+    def nearest(self, lat, lng, k=1, exclude=(), max_radius_km=None):
+        """
+        Returns up to `k` (user_id, distance_km) pairs ordered by distance.
+        """
+        exclude = set(exclude)
+
+        def enough(found, covered_km):
+            if len(found) < k:
+                return False
+            return sorted(d for d, _ in found)[k - 1] <= covered_km
+
+        found = self._scan(lat, lng, exclude, max_radius_km, enough)
+        return [(user_id, dist) for dist, user_id in found[:k]]
+
+    def within_radius(self, lat, lng, radius_km, exclude=()):
+        """
+        Returns every (user_id, distance_km) pair within `radius_km`, nearest first.
+        """
+        found = self._scan(lat, lng, set(exclude), radius_km, lambda found, covered_km: False)
+        return [(user_id, dist) for dist, user_id in found]
+
+
+driver_index = DriverSpatialIndex(
+    cell_size_km=getattr(settings, 'DRIVER_INDEX_CELL_KM', 1.0),
+    refresh_interval=getattr(settings, 'DRIVER_INDEX_REFRESH_SECONDS', 30),
+)
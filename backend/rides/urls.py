@@ -5,12 +5,13 @@ from .views import (
     RequestSeatView, HandleSeatRequestView, MyScheduledRequestsView,
     AvailableRidesView, SendMessageView, ListMessagesView, UserChatsView,
     RideHistoryView, DriverStatsView, MyRideRequestsView, RideCancelView, RideUpdateView,
-    CurrentRideView
+    CurrentRideView, FareCacheStatsView
 )
 
 urlpatterns = [
     path('current/', CurrentRideView.as_view(), name='current-ride'),
     path('fare-estimate/', FareEstimateView.as_view(), name='fare-estimate'),
+    path('fare-estimate/stats/', FareCacheStatsView.as_view(), name='fare-cache-stats'),
     path('create/', RideCreateView.as_view(), name='ride-create'),
     path('<int:pk>/status/', RideUpdateStatusView.as_view(), name='ride-update-status'),
     path('<int:pk>/', RideDetailView.as_view(), name='ride-detail'),
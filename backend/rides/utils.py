@@ -1,5 +1,9 @@
 import math
 
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
+
 def calculate_distance(lat1, lon1, lat2, lon2):
     """
     Calculate the great circle distance between two points 
@@ -13,23 +17,80 @@ def calculate_distance(lat1, lon1, lat2, lon2):
     dlat = lat2 - lat1 
     a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
     c = 2 * math.asin(math.sqrt(a)) 
-    r = 6371 # Radius of earth in kilometers. Use 3956 for miles.
+    r = EARTH_RADIUS_KM # Radius of earth in kilometers. Use 3956 for miles.
     return c * r
 
 def calculate_fare(distance_km, base_fare=0, per_km_rate=10, per_minute_rate=0, duration_minutes=0):
     """
-    Calculate ride fare based on distance.
+    Calculate ride fare based on distance and (when known) duration.
     Default: 10 BDT per kilometer (integer).
     User can negotiate a different fare later.
     """
-    # Simple calculation: base fare + (distance * rate per km)
+    # Simple calculation: base fare + (distance * rate per km) + (minutes * rate per minute)
     # Default for Zatra: 10 BDT/km with no base fare
-    fare = base_fare + (distance_km * per_km_rate)
+    # Rates may be Decimals (VehicleType fields); distances are floats
+    fare = float(base_fare) + (float(distance_km) * float(per_km_rate)) + (float(duration_minutes) * float(per_minute_rate))
     
     # Return as integer (round to nearest BDT)
     return int(round(fare))
 
 
+# --- Batch (NumPy) kernels ---
+# Array versions of calculate_distance/calculate_fare for assignment, fare
+# quoting and GPS checks that need thousands of pairs per call.
+
+def _haversine(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def pairwise_distances(lats1, lngs1, lats2, lngs2):
+    """
+    Element-wise distance in km between point i of the first set and
+    point i of the second set (arrays of equal length).
+    """
+    return _haversine(lats1, lngs1, lats2, lngs2)
+
+def distances_from(lat, lng, lats, lngs):
+    """
+    One-to-many: distance in km from a single point to every point in (lats, lngs).
+    """
+    return _haversine(lat, lng, lats, lngs)
+
+def distance_matrix(lats1, lngs1, lats2, lngs2):
+    """
+    Many-to-many: (len(lats1), len(lats2)) matrix of distances in km.
+    """
+    lats1 = np.asarray(lats1, dtype=np.float64)[:, np.newaxis]
+    lngs1 = np.asarray(lngs1, dtype=np.float64)[:, np.newaxis]
+    return _haversine(lats1, lngs1, lats2, lngs2)
+
+def segment_speeds_kmh(lats, lngs, timestamps):
+    """
+    Speed in km/h between consecutive GPS fixes (timestamps in seconds).
+    Segments with no elapsed time report 0.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+    elapsed = np.diff(np.asarray(timestamps, dtype=np.float64))
+    dist = _haversine(lats[:-1], lngs[:-1], lats[1:], lngs[1:])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        speeds = np.where(elapsed > 0, dist / elapsed * 3600, 0.0)
+    return speeds
+
+def calculate_fares(distance_km, base_fare=0, per_km_rate=10, per_minute_rate=0, duration_minutes=0):
+    """
+    Array version of calculate_fare. Rates may be scalars (one VehicleType)
+    or arrays aligned with distance_km (one VehicleType per ride).
+    Returns integer BDT fares.
+    """
+    distance_km, base_fare, per_km_rate, per_minute_rate, duration_minutes = (
+        np.asarray(v, dtype=np.float64) for v in (distance_km, base_fare, per_km_rate, per_minute_rate, duration_minutes)
+    )
+    fare = base_fare + distance_km * per_km_rate + duration_minutes * per_minute_rate
+    return np.rint(fare).astype(np.int64)
+
+
 def is_valid_coordinate(lat, lng):
     """Checks if coordinates are within reasonable global limits."""
     return -90 <= lat <= 90 and -180 <= lng <= 180
@@ -1,20 +1,34 @@
 from django.utils import timezone
-from django.db import models
+from django.db import models, transaction
 from rest_framework import generics, status, serializers
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework.views import APIView
 from rest_framework import permissions
 from .models import Ride, ScheduledRideRequest, ChatMessage
 from .serializers import (
     RideCreateSerializer, RideSerializer, RideStatusSerializer, 
-    ScheduledRideRequestSerializer, ChatMessageSerializer
+    ScheduledRideRequestSerializer, ChatMessageSerializer, AvailableRideSerializer
 )
-from .utils import calculate_distance, calculate_fare
-from vehicles.models import VehicleType, Vehicle
+from .utils import calculate_fare
+from .routing import estimate_trip
+from .quotes import fare_quotes
+from vehicles.models import Vehicle
 from .assignment import find_nearest_driver
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
+from .dispatch import dispatcher
+from users.location_store import location_store
+from tracking.outbox import outbox
+from tracking.push import push_to_users
+from django.conf import settings
+from rajbari_ride.pagination import KeysetPagination, TimestampKeysetPagination
+
+AVAILABLE_RIDES_RADIUS_KM = getattr(settings, 'AVAILABLE_RIDES_RADIUS_KM', 10)
+AVAILABLE_RIDES_DEFAULT_LIMIT = getattr(settings, 'AVAILABLE_RIDES_DEFAULT_LIMIT', 20)
+AVAILABLE_RIDES_MAX_LIMIT = getattr(settings, 'AVAILABLE_RIDES_MAX_LIMIT', 50)
+
+class AvailableRidesPagination(KeysetPagination):
+    page_size = AVAILABLE_RIDES_DEFAULT_LIMIT
+    max_page_size = AVAILABLE_RIDES_MAX_LIMIT
 
 class CurrentRideView(APIView):
     permission_classes = [IsAuthenticated]
@@ -40,34 +54,25 @@ class FareEstimateView(APIView):
             drop_lat = float(data.get('drop_lat'))
             drop_lng = float(data.get('drop_lng'))
 
-            distance_km = calculate_distance(pickup_lat, pickup_lng, drop_lat, drop_lng)
-            
-            # Fetch vehicle type rates
-            vehicle_type_id = data.get('requested_vehicle_type')
-            v_type = None
-            if vehicle_type_id:
-                v_type = VehicleType.objects.filter(id=vehicle_type_id).first()
-            
-            if v_type:
-                fare = calculate_fare(
-                    distance_km, 
-                    base_fare=v_type.base_fare, 
-                    per_km_rate=v_type.per_km_rate,
-                    per_minute_rate=v_type.per_minute_rate
-                )
-            else:
-                fare = calculate_fare(distance_km) # Uses defaults
-
-            return Response({
-                "distance_km": round(distance_km, 2),
-                "estimated_fare": fare
-            }, status=status.HTTP_200_OK)
+            # Quantized memo cache over the routing graph and VehicleType rate table
+            quote = fare_quotes.quote(
+                pickup_lat, pickup_lng, drop_lat, drop_lng,
+                vehicle_type_id=data.get('requested_vehicle_type')
+            )
+            return Response(quote, status=status.HTTP_200_OK)
 
         except (TypeError, ValueError) as e:
             return Response({"error": "Invalid coordinates provided."}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+class FareCacheStatsView(APIView):
+    """Hit/miss counters of this process's fare quote cache, for tuning."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(fare_quotes.stats())
+
 class RideCreateView(generics.CreateAPIView):
     queryset = Ride.objects.all()
     serializer_class = RideCreateSerializer
@@ -80,18 +85,14 @@ class RideCreateView(generics.CreateAPIView):
             drop_lat = serializer.validated_data['drop_lat']
             drop_lng = serializer.validated_data['drop_lng']
             
-            distance = calculate_distance(pickup_lat, pickup_lng, drop_lat, drop_lng)
-            
             v_type = serializer.validated_data.get('requested_vehicle_type')
-            if v_type:
-                fare = calculate_fare(
-                    distance,
-                    base_fare=v_type.base_fare,
-                    per_km_rate=v_type.per_km_rate,
-                    per_minute_rate=v_type.per_minute_rate
-                )
-            else:
-                fare = calculate_fare(distance)
+            # Priced like FareEstimateView (same snapped points and rates), so
+            # the rider is charged the fare they were quoted
+            quote = fare_quotes.quote(
+                pickup_lat, pickup_lng, drop_lat, drop_lng,
+                vehicle_type_id=v_type.id if v_type else None
+            )
+            distance, fare = quote['distance_km'], quote['estimated_fare']
             
             ride = serializer.save(
                 rider=self.request.user,
@@ -100,15 +101,8 @@ class RideCreateView(generics.CreateAPIView):
                 status='REQUESTED'
             )
 
-            # Broadcast to all drivers
-            channel_layer = get_channel_layer()
-            async_to_sync(channel_layer.group_send)(
-                'drivers_notification',
-                {
-                    'type': 'new_ride_request',
-                    'ride': RideSerializer(ride).data
-                }
-            )
+            # Offer to the nearest drivers in waves (not to every driver)
+            dispatcher.dispatch(ride)
         except Exception as e:
             import traceback
             print(traceback.format_exc()) # Log it in the server console
@@ -126,6 +120,16 @@ class RideUpdateStatusView(generics.UpdateAPIView):
         serializer = self.get_serializer(instance, data=request.data, partial=partial)
         if serializer.is_valid():
             try:
+                new_status = serializer.validated_data.get('status')
+                if new_status and new_status != instance.status:
+                    # Start/complete/cancel: conditional on the status the client saw
+                    fields = {}
+                    if 'driver' in serializer.validated_data:
+                        fields['driver'] = serializer.validated_data['driver']
+                    ride = Ride.transition(instance.pk, [instance.status], new_status, **fields)
+                    if ride is None:
+                        return Response({"error": "Ride status changed meanwhile"}, status=status.HTTP_409_CONFLICT)
+                    return Response(RideSerializer(ride).data)
                 serializer.save()
                 return Response(RideSerializer(instance).data)
             except Exception as e:
@@ -142,7 +146,6 @@ class DriverActionView(APIView):
     
     def post(self, request, pk):
         try:
-            ride = Ride.objects.get(pk=pk)
             action = request.data.get('action') # 'ACCEPT' or 'REJECT'
             user = request.user
             
@@ -150,27 +153,32 @@ class DriverActionView(APIView):
                  return Response({"error": "Only drivers can perform this action"}, status=status.HTTP_403_FORBIDDEN)
 
             if action == 'ACCEPT':
-                ride.driver = user
-                ride.status = 'ASSIGNED'
-                
-                # If there was a pending negotiation, mark it as accepted
-                if ride.negotiation_status == 'PENDING':
-                    ride.negotiation_status = 'ACCEPTED'
-                
-                ride.save()
+                # Only one of several drivers accepting at once wins the UPDATE
+                ride = Ride.transition(
+                    pk, ['REQUESTED'], 'ASSIGNED',
+                    driver=user,
+                    # If there was a pending negotiation, mark it as accepted
+                    negotiation_status=models.Case(
+                        models.When(negotiation_status='PENDING', then=models.Value('ACCEPTED')),
+                        default=models.F('negotiation_status')
+                    )
+                )
+                if ride is None:
+                    if not Ride.objects.filter(pk=pk).exists():
+                        raise Ride.DoesNotExist
+                    return Response({"error": "Ride is no longer available"}, status=status.HTTP_409_CONFLICT)
                 return Response({"status": "Ride Assigned", "ride": RideSerializer(ride).data})
             
             elif action == 'REJECT':
+                ride = Ride.objects.get(pk=pk)
                 ride.rejected_drivers.add(user)
-                ride.save()
                 
-                # Reassign
-                next_driver = find_nearest_driver(ride)
+                # Reassign: offer to the nearest driver who hasn't seen it yet
+                next_driver = find_nearest_driver(ride, exclude=dispatcher.offered_to(ride.id))
                 msg = "Searching for next driver"
                 if next_driver:
                     msg = f"Reassigning to {next_driver.username}"
-                    # In a real app, we'd notify next_driver via websocket/push.
-                    # Here we just acknowledge.
+                    dispatcher.offer_to(ride, [next_driver])
                 else:
                     msg = "No other drivers available"
                 
@@ -195,7 +203,7 @@ class ScheduledRideCreateView(generics.CreateAPIView):
         drop_lat = serializer.validated_data['drop_lat']
         drop_lng = serializer.validated_data['drop_lng']
         
-        distance = calculate_distance(pickup_lat, pickup_lng, drop_lat, drop_lng)
+        distance, _ = estimate_trip(pickup_lat, pickup_lng, drop_lat, drop_lng)
         fare = calculate_fare(distance)
         
         save_kwargs = {
@@ -215,9 +223,10 @@ class ScheduledRideListView(generics.ListAPIView):
     queryset = Ride.objects.filter(is_scheduled=True, scheduled_datetime__gt=timezone.now() - timezone.timedelta(hours=1))
     serializer_class = RideSerializer
     permission_classes = [AllowAny]
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
-        return Ride.objects.filter(is_scheduled=True, scheduled_datetime__gt=timezone.now() - timezone.timedelta(hours=1), available_seats__gt=0)
+        return Ride.objects.for_serializer(self.request.user).filter(is_scheduled=True, scheduled_datetime__gt=timezone.now() - timezone.timedelta(hours=1), available_seats__gt=0)
 
 class RequestSeatView(generics.CreateAPIView):
     serializer_class = ScheduledRideRequestSerializer
@@ -227,10 +236,7 @@ class RequestSeatView(generics.CreateAPIView):
         serializer.save(passenger=self.request.user)
         # Notify driver (Optional requirement)
         ride = serializer.validated_data['ride']
-        from asgiref.sync import async_to_sync
-        from channels.layers import get_channel_layer
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
+        outbox.publish(
             f'ride_{ride.id}',
             {
                 'type': 'seat_requested',
@@ -254,19 +260,30 @@ class HandleSeatRequestView(APIView):
             action = request.data.get('action') # 'APPROVE' or 'REJECT'
             
             if action == 'APPROVE':
-                has_profile = hasattr(seat_request.passenger, 'profile')
-                if not ride.driver and has_profile and seat_request.passenger.profile.role == 'DRIVER':
-                    ride.driver = seat_request.passenger
-                    # Driver taking the job doesn't necessarily consume a 'seat' from passengers' perspective
-                    # but we mark the request approved.
-                else:
-                    if ride.available_seats < seat_request.seats_requested:
-                        return Response({"error": "Not enough seats available"}, status=status.HTTP_400_BAD_REQUEST)
-                    ride.available_seats -= seat_request.seats_requested
-
-                seat_request.status = 'APPROVED'
-                ride.save()
-                seat_request.save()
+                # Conditional UPDATEs instead of saving the loaded rows, so two
+                # approvals racing can neither approve twice nor oversell seats
+                with transaction.atomic():
+                    if not ScheduledRideRequest.objects.filter(pk=pk).exclude(status='APPROVED').update(status='APPROVED'):
+                        return Response({"error": "Request already approved"}, status=status.HTTP_409_CONFLICT)
+
+                    rides = Ride.objects.filter(pk=ride.pk, status=ride.status)
+                    has_profile = hasattr(seat_request.passenger, 'profile')
+                    if not ride.driver and has_profile and seat_request.passenger.profile.role == 'DRIVER':
+                        # Driver taking the job doesn't necessarily consume a 'seat' from passengers' perspective
+                        # but we mark the request approved.
+                        updated = rides.filter(driver__isnull=True).update(
+                            driver=seat_request.passenger, updated_at=timezone.now()
+                        )
+                        error = "Ride already has a driver"
+                    else:
+                        updated = rides.filter(available_seats__gte=seat_request.seats_requested).update(
+                            available_seats=models.F('available_seats') - seat_request.seats_requested,
+                            updated_at=timezone.now()
+                        )
+                        error = "Not enough seats available"
+                    if not updated:
+                        transaction.set_rollback(True)
+                        return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
                 return Response({"status": "Approved"})
             
             elif action == 'REJECT':
@@ -284,6 +301,7 @@ class HandleSeatRequestView(APIView):
 class MyScheduledRequestsView(generics.ListAPIView):
     serializer_class = ScheduledRideRequestSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         user = self.request.user
@@ -303,18 +321,27 @@ class SendMessageView(generics.CreateAPIView):
     serializer_class = ChatMessageSerializer
 
     def perform_create(self, serializer):
-        serializer.save(sender=self.request.user)
+        message = serializer.save(sender=self.request.user)
+        push_to_users([message.receiver_id], {
+            'type': 'chat_message',
+            'message': serializer.data
+        })
 
 class ListMessagesView(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = ChatMessageSerializer
+    pagination_class = TimestampKeysetPagination
 
     def get_queryset(self):
         ride_id = self.request.query_params.get('ride_id')
         other_user_id = self.request.query_params.get('other_user_id')
+        after_id = self.request.query_params.get('after_id')
         user = self.request.user
 
-        qs = ChatMessage.objects.filter(ride_id=ride_id)
+        qs = ChatMessage.objects.filter(ride_id=ride_id).select_related('sender')
+        if after_id and after_id.isdigit():
+            # Reconnect backfill: only what the client has not seen yet
+            qs = qs.filter(id__gt=after_id)
         
         if other_user_id:
             qs = qs.filter(
@@ -357,23 +384,58 @@ class UserChatsView(APIView):
         return Response(list(chats.values()))
 
 class AvailableRidesView(generics.ListAPIView):
+    """
+    REQUESTED rides around the driver, nearest pickup first.
+
+    Query params: `radius_km` (capped at AVAILABLE_RIDES_RADIUS_KM),
+    `limit` (page size, capped at AVAILABLE_RIDES_MAX_LIMIT), `cursor`
+    and `vehicle_type`. Only rides the driver's active vehicles can serve
+    are listed.
+    """
     permission_classes = [permissions.IsAuthenticated]
-    serializer_class = RideSerializer
+    serializer_class = AvailableRideSerializer
+    pagination_class = AvailableRidesPagination
+
+    def _param(self, name, default, maximum, cast=float):
+        try:
+            value = cast(self.request.query_params.get(name, default))
+        except (TypeError, ValueError):
+            value = default
+        return max(min(value, maximum), 0)
 
     def get_queryset(self):
         user = self.request.user
         if not hasattr(user, 'profile') or user.profile.role != 'DRIVER' or not user.profile.is_online:
             return Ride.objects.none()
         
-        # In a real app, filter by distance here. For Rajbari, just show all REQUESTED.
-        return Ride.objects.filter(status='REQUESTED', driver__isnull=True).order_by('-id')
+        rides = Ride.objects.for_serializer(user).filter(status='REQUESTED', driver__isnull=True)
+
+        # Vehicle type: what the driver can serve (rides without a type fit anyone)
+        vehicle_types = set(Vehicle.objects.filter(driver=user.profile, is_active=True).values_list('vehicle_type_id', flat=True))
+        requested_type = self.request.query_params.get('vehicle_type')
+        if requested_type:
+            rides = rides.filter(models.Q(requested_vehicle_type__isnull=True) | models.Q(requested_vehicle_type_id=requested_type))
+        if vehicle_types:
+            rides = rides.filter(models.Q(requested_vehicle_type__isnull=True) | models.Q(requested_vehicle_type_id__in=vehicle_types))
+
+        position = location_store.position_of(user.profile)
+        if position:
+            # Only rides picking up around the driver (geohash prefilter + haversine)
+            radius_km = self._param('radius_km', AVAILABLE_RIDES_RADIUS_KM, AVAILABLE_RIDES_RADIUS_KM)
+            rides = rides.near(position[0], position[1], radius_km)
+            self.keyset_ordering = ('distance', 'id')
+        else:
+            self.keyset_ordering = ('-id',)
+        return rides
+
 class RideHistoryView(generics.ListAPIView):
     serializer_class = RideSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         user = self.request.user
-        return Ride.objects.filter(
+        return Ride.objects.for_serializer(user).filter(
             models.Q(rider=user) | models.Q(driver=user)
         ).order_by('-created_at')
 
@@ -402,10 +464,11 @@ class DriverStatsView(APIView):
 class MyRideRequestsView(generics.ListAPIView):
     serializer_class = RideSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         user = self.request.user
-        return Ride.objects.filter(rider=user).order_by('-created_at')
+        return Ride.objects.for_serializer(user).filter(rider=user).order_by('-created_at')
 
 class RideCancelView(APIView):
     permission_classes = [IsAuthenticated]
@@ -446,18 +509,13 @@ class RideUpdateView(generics.UpdateAPIView):
         drop_lat = serializer.validated_data.get('drop_lat', ride.drop_lat)
         drop_lng = serializer.validated_data.get('drop_lng', ride.drop_lng)
         
-        distance = calculate_distance(pickup_lat, pickup_lng, drop_lat, drop_lng)
-        
         v_type = serializer.validated_data.get('requested_vehicle_type', ride.requested_vehicle_type)
-        if v_type:
-            fare = calculate_fare(
-                distance,
-                base_fare=v_type.base_fare,
-                per_km_rate=v_type.per_km_rate,
-                per_minute_rate=v_type.per_minute_rate
-            )
-        else:
-             fare = calculate_fare(distance)
+        # Same pricing as the fare estimate the rider was shown
+        quote = fare_quotes.quote(
+            pickup_lat, pickup_lng, drop_lat, drop_lng,
+            vehicle_type_id=v_type.id if v_type else None
+        )
+        distance, fare = quote['distance_km'], quote['estimated_fare']
 
         serializer.save(distance_km=distance, estimated_fare=fare)
 
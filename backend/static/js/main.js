@@ -382,6 +382,7 @@ document.addEventListener('DOMContentLoaded', () => {
     // --- Polling Logic ---
     let driverPollInterval = null;
     let passengerPollInterval = null;
+    let driverPollTicks = 0;
     let lastKnownRequestIds = new Set();
 
     function startDriverPolling() {
@@ -390,6 +391,8 @@ document.addEventListener('DOMContentLoaded', () => {
         driverPollInterval = setInterval(async () => {
             const token = localStorage.getItem('token');
             if (!token) return;
+            // Offers are pushed on the notification socket; only refresh the list every 30s then
+            if (isSocketOpen(notificationSocket) && (++driverPollTicks % 6) !== 0) return;
             try {
                 const res = await fetch('/api/rides/available/', {
                     headers: { 'Authorization': `Token ${token}` }
@@ -433,6 +436,8 @@ document.addEventListener('DOMContentLoaded', () => {
 
         passengerPollInterval = setInterval(async () => {
             const token = localStorage.getItem('token');
+            // Status changes are pushed on ws/me/ while it is connected
+            if (isSocketOpen(userSocket)) return;
             try {
                 const res = await fetch(`/api/rides/${rideId}/`, {
                     headers: { 'Authorization': `Token ${token}` }
@@ -587,6 +592,8 @@ document.addEventListener('DOMContentLoaded', () => {
             const role = currentUser.profile.role;
             localStorage.setItem('userRole', role);
 
+            if (!userSocket) connectUserSocket();
+
             if (role === 'DRIVER') {
                 if (passengerUI) passengerUI.style.display = 'none';
                 if (driverUI) driverUI.style.display = 'block';
@@ -1339,6 +1346,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
     // --- WebSocket & Payments (Kept from original) ---
     let rideSocket = null;
+    let rideSocketRideId = null;
     let gpsInterval = null;
 
     window.connectWebSocket = function (rideId, token, isDriver) {
@@ -1347,10 +1355,15 @@ document.addEventListener('DOMContentLoaded', () => {
 
         console.log(`[Socket] Connecting to Ride ${rideId}...`);
         rideSocket = new WebSocket(wsUrl);
+        rideSocketRideId = rideId;
 
         rideSocket.onopen = () => {
             console.log("[Socket] Connected! Initializing live location...");
             startSendingLocation();
+            // Backfill chat missed while disconnected
+            if (String(currentChatRideId) === String(rideId) && chatMessages.length) {
+                loadChatMessages(rideId, currentChatOtherId, lastChatId());
+            }
         };
 
         rideSocket.onmessage = (e) => {
@@ -1367,6 +1380,10 @@ document.addEventListener('DOMContentLoaded', () => {
             } else if (data.type === 'status_update') {
                 console.log('[WebSocket] Status update received:', data.status); // DEBUG
                 updateRideStatus(data.status, data);
+            } else if (data.type === 'chat_message') {
+                receiveChatMessage(data.message);
+            } else if (data.type === 'chat_ack') {
+                ackChatMessages(data.acks);
             }
         };
 
@@ -1680,6 +1697,7 @@ document.addEventListener('DOMContentLoaded', () => {
         console.log('[Payment Polling] Starting to check for cash payments every 2 seconds');
 
         paymentPollingInterval = setInterval(async () => {
+            if (isSocketOpen(userSocket)) return; // Payment updates are pushed on ws/me/
             try {
                 const res = await fetch('/api/rides/current/', {
                     headers: { 'Authorization': `Token ${token}` }
@@ -1714,6 +1732,7 @@ document.addEventListener('DOMContentLoaded', () => {
     let currentChatRideId = null;
     let currentChatOtherId = null;
     let chatInterval = null; // Fix: Add missing variable declaration
+    let chatMessages = []; // Messages of the open chat; unsaved ones have a nonce and no id yet
     let currentChatOtherName = null;
 
     window.openChat = function (rideId, otherId, otherName) {
@@ -1740,7 +1759,7 @@ document.addEventListener('DOMContentLoaded', () => {
         currentChatOtherName = null;
     };
 
-    async function loadChatMessages(rideId, otherUserId = null) {
+    async function loadChatMessages(rideId, otherUserId = null, afterId = null) {
         const token = localStorage.getItem('token');
         const messagesDiv = document.getElementById('chat-messages');
         if (!messagesDiv) return;
@@ -1753,19 +1772,62 @@ document.addEventListener('DOMContentLoaded', () => {
             if (targetOtherId) {
                 url += `&other_user_id=${targetOtherId}`;
             }
+            if (afterId) {
+                url += `&after_id=${afterId}`;
+            }
 
-            const res = await fetch(url, {
+            const messages = await fetchAllPages(url, {
                 headers: { 'Authorization': `Token ${token}` }
             });
-            if (res.ok) {
-                const messages = await res.json();
-                displayChatMessages(messages);
+            if (messages) {
+                if (afterId) {
+                    messages.forEach(msg => receiveChatMessage(msg, false));
+                } else {
+                    chatMessages = messages;
+                }
+                displayChatMessages(chatMessages);
             }
         } catch (e) {
             console.error('[Chat] Load error', e);
         }
     }
 
+    // Lists are paged by cursor; the next page is in the Link header
+    async function fetchAllPages(url, options) {
+        const items = [];
+        while (url) {
+            const res = await fetch(url, options);
+            if (!res.ok) return null;
+            items.push(...await res.json());
+            const next = (res.headers.get('Link') || '').match(/<([^>]+)>;\s*rel="next"/);
+            url = next ? next[1] : null;
+        }
+        return items;
+    }
+
+    function lastChatId() {
+        return chatMessages.reduce((max, msg) => (msg.id && msg.id > max ? msg.id : max), 0) || null;
+    }
+
+    // Adds a pushed message to the open chat, skipping ones already shown
+    function receiveChatMessage(msg, render = true) {
+        if (!currentChatRideId || String(currentChatRideId) !== String(msg.ride)) return;
+        const known = chatMessages.some(m =>
+            (msg.id && m.id === msg.id) || (msg.nonce && m.nonce === msg.nonce)
+        );
+        if (known) return;
+        chatMessages.push(msg);
+        if (render) displayChatMessages(chatMessages);
+    }
+
+    // Saved messages get their ids (chat_ack) so reconnects can backfill from the last one
+    function ackChatMessages(acks) {
+        acks.forEach(ack => {
+            const msg = chatMessages.find(m => ack.nonce && m.nonce === ack.nonce);
+            if (msg) msg.id = ack.id;
+        });
+    }
+
     function displayChatMessages(messages) {
         const messagesDiv = document.getElementById('chat-messages');
         if (!messagesDiv) return;
@@ -1808,6 +1870,13 @@ document.addEventListener('DOMContentLoaded', () => {
         const originalMsg = input.value;
         input.value = '';
 
+        // Ride chat goes over the ride socket when it is connected
+        if (isSocketOpen(rideSocket) && String(rideSocketRideId) === String(currentChatRideId)) {
+            const nonce = `${currentUser.id}-${Date.now()}-${Math.random().toString(36).slice(2, 8)}`;
+            rideSocket.send(JSON.stringify({ type: 'chat_message', content: message, nonce: nonce }));
+            return;
+        }
+
         try {
             // Using correct backend endpoint and field names
             const res = await fetch(`/api/rides/messages/send/`, {
@@ -1825,7 +1894,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
             if (res.ok) {
                 console.log('[Chat] Message sent successfully');
-                loadChatMessages(currentChatRideId);
+                loadChatMessages(currentChatRideId, currentChatOtherId, lastChatId());
             } else {
                 input.value = originalMsg;
                 const errData = await res.json();
@@ -1846,7 +1915,8 @@ document.addEventListener('DOMContentLoaded', () => {
     function startPolling() {
         clearInterval(chatInterval);
         chatInterval = setInterval(() => {
-            if (currentChatRideId) loadChatMessages(currentChatRideId, currentChatOtherId);
+            if (isSocketOpen(userSocket)) return; // New messages are pushed on ws/me/
+            if (currentChatRideId) loadChatMessages(currentChatRideId, currentChatOtherId, lastChatId());
         }, 3000);
     }
 
@@ -1894,6 +1964,47 @@ document.addEventListener('DOMContentLoaded', () => {
     }
     window.connectNotificationSocket = connectNotificationSocket;
 
+    // --- Personal push socket (ws/me/): ride status, assignment, payment and chat events ---
+    let userSocket = null;
+
+    function isSocketOpen(socket) {
+        return !!socket && socket.readyState === WebSocket.OPEN;
+    }
+
+    function connectUserSocket() {
+        const token = localStorage.getItem('token');
+        if (!token || !currentUser) return;
+
+        const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+        userSocket = new WebSocket(`${protocol}//${window.location.host}/ws/me/?token=${token}`);
+
+        userSocket.onopen = () => {
+            console.log("[Me Socket] Connected, polling paused.");
+        };
+
+        userSocket.onmessage = (e) => {
+            const data = JSON.parse(e.data);
+            if (data.type === 'status_update') {
+                // The ride socket already delivers updates for the ride it tracks
+                if (!isSocketOpen(rideSocket)) updateRideStatus(data.status, data);
+                if (data.status !== 'COMPLETED' && data.status !== 'PAYMENT_PENDING') stopPaymentPolling();
+            } else if (data.type === 'ride_assigned') {
+                updateRideStatus(data.ride.status, data.ride);
+            } else if (data.type === 'payment_update') {
+                if (currentUser && currentUser.profile && currentUser.profile.role === 'DRIVER') fetchWalletStats();
+            } else if (data.type === 'chat_message') {
+                receiveChatMessage(data.message);
+            }
+        };
+
+        userSocket.onclose = () => {
+            console.log("[Me Socket] Closed, falling back to polling. Reconnecting in 5s...");
+            userSocket = null;
+            setTimeout(connectUserSocket, 5000);
+        };
+    }
+    window.connectUserSocket = connectUserSocket;
+
     function handleNewRideRequest(ride, allowRefresh = true) {
         // If we are here, we should show it. Polling only runs if online anyway.
         if (currentUser && currentUser.profile) {
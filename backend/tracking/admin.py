@@ -1,3 +1,9 @@
 from django.contrib import admin
+from .models import RideTrailChunk
 
-# Register your models here.
+@admin.register(RideTrailChunk)
+class RideTrailChunkAdmin(admin.ModelAdmin):
+    list_display = ('ride', 'user', 'start_time', 'point_count')
+    search_fields = ('ride__id', 'user__username')
+    exclude = ('lat_e6', 'lng_e6', 'time_deltas_ms')
+    readonly_fields = ('ride', 'user', 'start_time', 'point_count')
@@ -0,0 +1,87 @@
+import threading
+
+from django.conf import settings
+from django.utils import timezone
+
+from rajbari_ride.background import PeriodicTask
+from rides.models import ChatMessage
+from rides.serializers import ChatMessageSerializer
+from .outbox import outbox
+from .push import push_to_users
+
+
+def chat_payload(message, nonce=None):
+    """What clients receive for a message; `id` is None until it is saved."""
+    data = ChatMessageSerializer(message).data
+    data['nonce'] = nonce
+    return data
+
+
+class ChatWriter:
+    """
+    Write-behind persistence for chat sent over the ride socket.
+
+    Messages are delivered to the room straight away and queued here; every
+    `flush_interval` seconds the queue is saved with one bulk_create. The
+    room then gets a `chat_ack` mapping each client nonce to its new id (so
+    clients can backfill from their last seen id after a reconnect), and
+    receivers get the saved message on their `ws/me/` socket.
+    """
+
+    def __init__(self, flush_interval=1, batch_size=100):
+        self.batch_size = batch_size
+        self._pending = []  # [(ChatMessage, nonce), ...]
+        self._lock = threading.Lock()
+        self._flusher = PeriodicTask('chat-flush', flush_interval, self.flush)
+
+    def append(self, ride_id, sender, receiver_id, content, nonce=None):
+        """Queues a message and returns the unsaved instance. No database access."""
+        message = ChatMessage(
+            ride_id=ride_id, sender=sender, receiver_id=receiver_id,
+            content=content, timestamp=timezone.now()
+        )
+        with self._lock:
+            self._pending.append((message, nonce))
+        self._flusher.start()
+        return message
+
+    def pending(self):
+        return len(self._pending)
+
+    def flush(self):
+        """Saves every queued message. Returns the number written."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return 0
+
+        try:
+            ChatMessage.objects.bulk_create([message for message, _ in pending], batch_size=self.batch_size)
+        except Exception:
+            with self._lock:
+                self._pending[:0] = pending
+            raise
+
+        acks = {}
+        for message, nonce in pending:
+            acks.setdefault(message.ride_id, []).append({'nonce': nonce, 'id': message.id})
+        for ride_id, ride_acks in acks.items():
+            outbox.publish(
+                f'ride_{ride_id}',
+                {
+                    'type': 'chat_ack',
+                    'acks': ride_acks
+                }
+            )
+        for message, nonce in pending:
+            push_to_users([message.receiver_id], {
+                'type': 'chat_message',
+                'message': chat_payload(message, nonce)
+            })
+        return len(pending)
+
+
+chat_writer = ChatWriter(
+    flush_interval=getattr(settings, 'CHAT_FLUSH_INTERVAL', 1),
+    batch_size=getattr(settings, 'CHAT_BATCH_SIZE', 100),
+)
@@ -1,9 +1,29 @@
 import json
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
-from channels.db import database_sync_to_async
+from rajbari_ride.db_executor import database_async
 from rides.models import Ride
+from rides.spatial_index import driver_index
+from rides.dispatch import driver_group_name, driver_cell_groups, driver_moved_event
+from users.location_store import location_store
+from users.presence import presence
+from .chat import chat_payload, chat_writer
+from .fanout import location_fanout
+from .push import user_group_name
+from .trail import trail_writer
+from .wire import WireProtocolMixin
+
+# Ride statuses in which participants stream their location
+TRACKED_STATUSES = ('ASSIGNED', 'ONGOING')
+RIDE_STATUSES = {choice for choice, _ in Ride.STATUS_CHOICES}
+CHAT_MAX_LENGTH = 2000
+
+class RideConsumer(WireProtocolMixin, AsyncJsonWebsocketConsumer):
+    """
+    Live channel for one ride. The ride's status and participants and the
+    user's profile are loaded once at connect and then kept current from the
+    `ride_status_update` group events, so location frames run no queries.
+    """
 
-class RideConsumer(AsyncJsonWebsocketConsumer):
     async def connect(self):
         self.ride_id = self.scope['url_route']['kwargs']['ride_id']
         self.room_group_name = f'ride_{self.ride_id}'
@@ -15,7 +35,7 @@ class RideConsumer(AsyncJsonWebsocketConsumer):
             return
 
         # Check permissions (Rider or Driver of this ride)
-        is_authorized = await self.is_authorized_for_ride(self.ride_id, self.user)
+        is_authorized = await self.load_ride_state(self.ride_id, self.user)
         if not is_authorized:
             await self.close()
             return
@@ -26,7 +46,8 @@ class RideConsumer(AsyncJsonWebsocketConsumer):
             self.channel_name
         )
 
-        await self.accept()
+        await self.accept_protocol()
+        presence.connected(self.user.id)
 
     async def disconnect(self, close_code):
         # Leave room group
@@ -34,14 +55,17 @@ class RideConsumer(AsyncJsonWebsocketConsumer):
             self.room_group_name,
             self.channel_name
         )
+        if hasattr(self, 'profile'):
+            presence.disconnected(self.user.id)
+            trail_writer.close(self.ride_id, self.user.id)
 
     # Receive message from WebSocket
     async def receive_json(self, content):
         message_type = content.get('type')
         
         if message_type == 'location_update':
-            # Check if ride is ONGOING or ASSIGNED
-            if not await self.is_ride_ongoing(self.ride_id):
+            # Check if ride is ONGOING or ASSIGNED (cached, see ride_status_update)
+            if self.ride_status not in TRACKED_STATUSES or not self.is_participant():
                  return
 
             lat = content.get('lat')
@@ -79,22 +103,68 @@ class RideConsumer(AsyncJsonWebsocketConsumer):
             self.last_update = {'lat': lat, 'lng': lng, 'time': now}
             
             # Update User Profile (Persistence)
-            await self.update_user_location(self.user, lat, lng)
+            await self.update_user_location(lat, lng)
 
-            # Send message to room group including role and sender_id
-            await self.channel_layer.group_send(
+            # Append to the ride's GPS trail (buffered, written in chunks)
+            trail_writer.append(self.ride_id, self.user.id, lat, lng, now)
+
+            # Queue for the room group including role and sender_id (coalesced per tick)
+            location_fanout.publish(
+                self.channel_layer,
                 self.room_group_name,
                 {
-                    'type': 'ride_location_update',
                     'lat': lat,
                     'lng': lng,
                     'user_id': self.user.id,
-                    'role': self.user.profile.role
+                    'role': self.role
                 }
             )
+        elif message_type == 'chat_message':
+            await self.receive_chat(content)
+
+    async def receive_chat(self, content):
+        text = str(content.get('content') or '').strip()
+        if not text or not self.is_participant():
+            return
+        if len(text) > CHAT_MAX_LENGTH:
+            await self.send_json({"error": "Message too long"})
+            return
+        receiver_id = self.driver_id if self.user.id == self.rider_id else self.rider_id
+        if receiver_id is None:
+            await self.send_json({"error": "No one to chat with yet"})
+            return
+
+        # Delivered now, saved in the next batch (see ChatWriter)
+        message = chat_writer.append(int(self.ride_id), self.user, receiver_id, text, nonce=content.get('nonce'))
+        await self.channel_layer.group_send(
+            self.room_group_name,
+            {
+                'type': 'ride_chat_message',
+                'message': chat_payload(message, content.get('nonce'))
+            }
+        )
 
     # Receive message from room group
+    async def ride_chat_message(self, event):
+        await self.send_json({
+            'type': 'chat_message',
+            'message': event['message']
+        })
+
+    async def chat_ack(self, event):
+        await self.send_json({
+            'type': 'chat_ack',
+            'acks': event['acks']
+        })
+
+    async def ride_location_batch(self, event):
+        for position in event['positions']:
+            await self.ride_location_update(position)
+
     async def ride_location_update(self, event):
+        # Don't echo a user's own position back to them
+        if event['user_id'] == self.user.id:
+            return
         # Send message to WebSocket
         await self.send_json({
             'type': 'location_update',
@@ -105,6 +175,14 @@ class RideConsumer(AsyncJsonWebsocketConsumer):
         })
 
     async def ride_status_update(self, event):
+        # Keep the cached ride state current; PAYMENT_PENDING etc. are UI-only states
+        if event['status'] in RIDE_STATUSES:
+            self.ride_status = event['status']
+            if self.ride_status not in TRACKED_STATUSES:
+                trail_writer.close(self.ride_id)  # Tracking is over
+        if 'driver_id' in event:
+            self.driver_id = event['driver_id']
+
         await self.send_json({
             'type': 'status_update',
             'status': event['status'],
@@ -115,45 +193,62 @@ class RideConsumer(AsyncJsonWebsocketConsumer):
             'rider_username': event.get('rider_username')
         })
 
-    @database_sync_to_async
-    def is_authorized_for_ride(self, ride_id, user):
+    @database_async
+    def load_ride_state(self, ride_id, user):
         try:
-            ride = Ride.objects.get(pk=ride_id)
-            return ride.rider == user or ride.driver == user
+            ride = Ride.objects.values('status', 'rider_id', 'driver_id').get(pk=ride_id)
         except Ride.DoesNotExist:
             return False
+        self.ride_status = ride['status']
+        self.rider_id = ride['rider_id']
+        self.driver_id = ride['driver_id']
+        if not self.is_participant():
+            return False
+        self.profile = user.profile
+        self.role = self.profile.role
+        return True
 
-    @database_sync_to_async
+    def is_participant(self):
+        return self.user.id in (self.rider_id, self.driver_id)
+
+    @database_async
     def is_driver(self, user):
         return hasattr(user, 'profile') and user.profile.role == 'DRIVER'
 
-    @database_sync_to_async
-    def update_user_location(self, user, lat, lng):
-            user.profile.current_lat = lat
-            user.profile.current_lng = lng
-            user.profile.save()
+    async def update_user_location(self, lat, lng):
+        # In-memory only: the location store writes the row behind
+        previous = location_store.record(self.profile, lat, lng)
+        presence.heartbeat(self.user.id)
+        driver_index.sync_profile(self.profile)
+        if self.role == 'DRIVER':
+            event = driver_moved_event(previous, lat, lng)
+            if event:
+                await self.channel_layer.group_send(driver_group_name(self.user.id), event)
 
-    @database_sync_to_async
-    def is_ride_ongoing(self, ride_id):
-        try:
-            ride = Ride.objects.get(pk=ride_id)
-            return ride.status in ['ASSIGNED', 'ONGOING']
-        except Ride.DoesNotExist:
-            return False
+class NotificationConsumer(WireProtocolMixin, AsyncJsonWebsocketConsumer):
+    """
+    A driver's offer feed. Joins the driver's personal group plus the
+    geocell groups around their position, which follow them as they move
+    (`driver_moved` events).
+    """
 
-class NotificationConsumer(AsyncJsonWebsocketConsumer):
     async def connect(self):
         self.user = self.scope['user']
+        self.cell_groups = set()
         if not self.user.is_authenticated or not await self.is_driver(self.user):
             await self.close()
             return
 
-        self.group_name = 'drivers_notification'
+        # Personal group: ride offers are targeted per driver
+        self.group_name = driver_group_name(self.user.id)
         await self.channel_layer.group_add(
             self.group_name,
             self.channel_name
         )
-        await self.accept()
+        position = await self.get_position(self.user)
+        await self.move_to(*(position or (None, None)))
+        await self.accept_protocol()
+        presence.connected(self.user.id)
 
     async def disconnect(self, close_code):
         if hasattr(self, 'group_name'):
@@ -161,13 +256,73 @@ class NotificationConsumer(AsyncJsonWebsocketConsumer):
                 self.group_name,
                 self.channel_name
             )
+            presence.disconnected(self.user.id)
+        await self.move_to(None, None)
+
+    async def move_to(self, lat, lng):
+        groups = driver_cell_groups(lat, lng)
+        for group in self.cell_groups - groups:
+            await self.channel_layer.group_discard(group, self.channel_name)
+        for group in groups - self.cell_groups:
+            await self.channel_layer.group_add(group, self.channel_name)
+        self.cell_groups = groups
+
+    async def driver_moved(self, event):
+        await self.move_to(event['lat'], event['lng'])
 
     async def new_ride_request(self, event):
+        # Geocell broadcasts skip drivers already offered the ride or who rejected it
+        if self.user.id in event.get('exclude', ()):
+            return
         await self.send_json({
             'type': 'new_ride_request',
             'ride': event['ride']
         })
 
-    @database_sync_to_async
+    async def ride_assigned(self, event):
+        await self.send_json({
+            'type': 'ride_assigned',
+            'ride': event['ride']
+        })
+
+    @database_async
     def is_driver(self, user):
         return hasattr(user, 'profile') and user.profile.role == 'DRIVER'
+
+    @database_async
+    def get_position(self, user):
+        if not user.profile.is_online:
+            return None
+        return location_store.position_of(user.profile)
+
+class UserConsumer(WireProtocolMixin, AsyncJsonWebsocketConsumer):
+    """
+    One socket per signed-in user (`ws/me/`) multiplexing everything pushed
+    to them: ride status and assignment, payment and chat events. Replaces
+    the client's REST polling while it is connected.
+    """
+
+    async def connect(self):
+        self.user = self.scope['user']
+        if not self.user.is_authenticated:
+            await self.close()
+            return
+
+        self.group_name = user_group_name(self.user.id)
+        await self.channel_layer.group_add(
+            self.group_name,
+            self.channel_name
+        )
+        await self.accept_protocol()
+        presence.connected(self.user.id)
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(
+                self.group_name,
+                self.channel_name
+            )
+            presence.disconnected(self.user.id)
+
+    async def user_push(self, event):
+        await self.send_json(event['message'])
@@ -0,0 +1,38 @@
+import asyncio
+
+from django.conf import settings
+
+
+class LocationFanout:
+    """
+    Coalesces ride location frames before they hit the channel layer.
+
+    Consumers `publish()` every accepted frame; only the latest position per
+    user is kept, and each ride group gets at most one `ride_location_batch`
+    event per `tick` seconds. The first frame after a quiet period is sent
+    straight away, so coalescing never adds more than one tick of delay.
+    """
+
+    def __init__(self, tick=1.0):
+        self.tick = tick
+        self._pending = {}  # group -> {user_id: position}
+        self._task = None
+
+    def publish(self, channel_layer, group, position):
+        self._pending.setdefault(group, {})[position['user_id']] = position
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._task = loop.create_task(self._run(channel_layer))
+
+    async def _run(self, channel_layer):
+        while self._pending:
+            pending, self._pending = self._pending, {}
+            for group, positions in pending.items():
+                await channel_layer.group_send(group, {
+                    'type': 'ride_location_batch',
+                    'positions': list(positions.values()),
+                })
+            await asyncio.sleep(self.tick)
+
+
+location_fanout = LocationFanout(tick=getattr(settings, 'LOCATION_FANOUT_TICK', 1.0))
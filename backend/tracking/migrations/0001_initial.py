@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-18 06:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = [
+        ("rides", "0010_ride_pickup_geohash"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RideTrailChunk",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("start_time", models.DateTimeField()),
+                ("point_count", models.PositiveIntegerField()),
+                ("lat_e6", models.BinaryField()),
+                ("lng_e6", models.BinaryField()),
+                ("time_deltas_ms", models.BinaryField()),
+                ("ride", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="trail_chunks", to="rides.ride")),
+                ("user", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="trail_chunks", to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                "ordering": ["start_time", "id"],
+            },
+        ),
+    ]
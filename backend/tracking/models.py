@@ -1,3 +1,78 @@
+import sys
+from array import array
+from datetime import timedelta
+
+from django.contrib.auth.models import User
 from django.db import models
 
-# Create your models here.
+MICRODEGREES = 1_000_000
+
+
+def pack_int32(values):
+    """Little-endian int32 bytes, independent of the host byte order."""
+    packed = array('i', values)
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def unpack_int32(data):
+    values = array('i')
+    values.frombytes(bytes(data))
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+class RideTrailChunk(models.Model):
+    """
+    A batch of consecutive GPS fixes sent by one user during one ride.
+
+    Points are stored column-wise as packed int32 arrays: latitude and
+    longitude in microdegrees (~0.1 m) and the time since the previous
+    point in milliseconds (the first delta is relative to `start_time`).
+    That is 12 bytes per point instead of one Decimal row per fix.
+    """
+    ride = models.ForeignKey('rides.Ride', on_delete=models.CASCADE, related_name='trail_chunks')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='trail_chunks')
+    start_time = models.DateTimeField()
+    point_count = models.PositiveIntegerField()
+
+    lat_e6 = models.BinaryField()
+    lng_e6 = models.BinaryField()
+    time_deltas_ms = models.BinaryField()
+
+    class Meta:
+        ordering = ['start_time', 'id']
+
+    def __str__(self):
+        return f"Trail of {self.user_id} on Ride #{self.ride_id} ({self.point_count} points)"
+
+    @classmethod
+    def pack(cls, ride_id, user_id, points):
+        """Builds an unsaved chunk from [(lat, lng, datetime), ...] in time order."""
+        start_time = points[0][2]
+        deltas = []
+        # Deltas run from the time points() will reconstruct, not the true
+        # previous timestamp, so rounding never accumulates across a chunk
+        previous = start_time
+        for _, _, when in points:
+            delta = round((when - previous).total_seconds() * 1000)
+            deltas.append(delta)
+            previous += timedelta(milliseconds=delta)
+        return cls(
+            ride_id=ride_id,
+            user_id=user_id,
+            start_time=start_time,
+            point_count=len(points),
+            lat_e6=pack_int32(round(lat * MICRODEGREES) for lat, _, _ in points),
+            lng_e6=pack_int32(round(lng * MICRODEGREES) for _, lng, _ in points),
+            time_deltas_ms=pack_int32(deltas),
+        )
+
+    def points(self):
+        """Yields (lat, lng, datetime) for every point in the chunk."""
+        when = self.start_time
+        for lat, lng, delta in zip(unpack_int32(self.lat_e6), unpack_int32(self.lng_e6), unpack_int32(self.time_deltas_ms)):
+            when = when + timedelta(milliseconds=delta)
+            yield lat / MICRODEGREES, lng / MICRODEGREES, when
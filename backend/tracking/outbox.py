@@ -0,0 +1,122 @@
+import asyncio
+import atexit
+import logging
+import queue
+import threading
+
+from channels.layers import InMemoryChannelLayer, get_channel_layer
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+
+class EventOutbox:
+    """
+    Realtime events raised by sync code (views, model methods, services).
+
+    `publish()` records an event against the current transaction and only
+    queues it once that commits, so rolled back changes are never
+    announced; outside a transaction it is queued at once. With a Redis
+    layer, a dispatcher thread with its own event loop drains the queue in
+    batches of up to `batch_size` and sends them, concurrently across
+    groups and in order within each group, so callers never wait on the
+    broker. The in-memory layer's groups only hold sockets accepted by this
+    process, whose queues belong to the server's event loop, so there
+    events are handed to that loop (see `bind_loop()`) instead.
+    """
+
+    def __init__(self, batch_size=500):
+        self.batch_size = batch_size
+        self._queue = queue.SimpleQueue()  # (group, event)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._server_loop = None
+        self.sent = 0
+        self.failed = 0
+
+    def publish(self, group, event, using=None):
+        """Sends `event` to `group` after the current transaction commits."""
+        transaction.on_commit(lambda: self.enqueue(group, event), using=using)
+
+    def bind_loop(self, loop):
+        """Records the event loop sockets are accepted on (called on connect)."""
+        self._server_loop = loop
+
+    def enqueue(self, group, event):
+        """Queues `event` for `group` right away; safe from any thread or loop."""
+        channel_layer = get_channel_layer()
+        if not isinstance(channel_layer, InMemoryChannelLayer):
+            self._queue.put((group, event))
+            self._start()
+            return
+        loop = self._server_loop
+        if loop is None or loop.is_closed():
+            return  # No socket was ever accepted here, so no group has members
+        send = self._send_group(channel_layer, group, [event])
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            loop.create_task(send)
+        else:
+            asyncio.run_coroutine_threadsafe(send, loop)
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='event-outbox', daemon=True)
+            self._thread.start()
+            atexit.register(self.drain)
+
+    def _take_batch(self, block):
+        try:
+            batch = [self._queue.get(block=block)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        while True:
+            loop.run_until_complete(self._send(self._take_batch(block=True)))
+
+    def drain(self):
+        """Sends everything still queued from the calling thread (shutdown, tests)."""
+        batch = self._take_batch(block=False)
+        while batch:
+            asyncio.run(self._send(batch))
+            batch = self._take_batch(block=False)
+
+    async def _send(self, batch):
+        by_group = {}
+        for group, event in batch:
+            by_group.setdefault(group, []).append(event)
+        channel_layer = get_channel_layer()
+        await asyncio.gather(*(
+            self._send_group(channel_layer, group, events) for group, events in by_group.items()
+        ))
+
+    async def _send_group(self, channel_layer, group, events):
+        for event in events:
+            try:
+                await channel_layer.group_send(group, event)
+                self.sent += 1
+            except Exception:
+                self.failed += 1
+                logger.exception("Outbox send to %s failed", group)
+
+
+outbox = EventOutbox(batch_size=getattr(settings, 'OUTBOX_BATCH_SIZE', 500))
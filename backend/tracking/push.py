@@ -0,0 +1,23 @@
+from .outbox import outbox
+
+
+def user_group_name(user_id):
+    """Personal channel group joined by every `ws/me/` socket of a user."""
+    return f'user_{user_id}'
+
+
+def push_to_users(user_ids, message):
+    """
+    Sends `message` (the JSON object the client receives) to each user's
+    `ws/me/` sockets once the current transaction commits (see
+    `outbox`). Meant for sync code such as views and model methods;
+    missing users (None) are skipped.
+    """
+    for user_id in {user_id for user_id in user_ids if user_id is not None}:
+        outbox.publish(
+            user_group_name(user_id),
+            {
+                'type': 'user_push',
+                'message': message
+            }
+        )
@@ -4,4 +4,5 @@ from . import consumers
 websocket_urlpatterns = [
     re_path(r'ws/rides/(?P<ride_id>\d+)/$', consumers.RideConsumer.as_asgi()),
     path('ws/notifications/', consumers.NotificationConsumer.as_asgi()),
+    path('ws/me/', consumers.UserConsumer.as_asgi()),
 ]
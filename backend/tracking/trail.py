@@ -0,0 +1,122 @@
+import heapq
+import threading
+from datetime import datetime, timezone as dt_timezone
+from operator import itemgetter
+
+import numpy as np
+from django.conf import settings
+
+from rajbari_ride.background import PeriodicTask
+from rides.utils import pairwise_distances
+from .models import RideTrailChunk, unpack_int32, MICRODEGREES
+
+
+class TrailWriter:
+    """
+    Buffers GPS fixes per (ride, user) in memory and writes them as packed
+    RideTrailChunk rows. A buffer becomes a chunk once it holds `chunk_size`
+    points, or earlier when `close()` ends it (the socket closed or the ride
+    is over). Chunks are saved with one bulk_create every `flush_interval`
+    seconds; open buffers are only written at process exit, so a ride's
+    trail is not split into many tiny chunks.
+    """
+
+    def __init__(self, chunk_size=256, flush_interval=10):
+        self.chunk_size = chunk_size
+        self._buffers = {}  # (ride_id, user_id) -> [(lat, lng, datetime), ...]
+        self._ready = []  # unsaved RideTrailChunk instances
+        self._lock = threading.Lock()
+        self._flusher = PeriodicTask(
+            'ride-trail-flush', flush_interval, self.flush,
+            on_stop=lambda: self.flush(partial=True),
+        )
+
+    def append(self, ride_id, user_id, lat, lng, timestamp):
+        """Adds one fix (timestamp in epoch seconds). No database access."""
+        point = (float(lat), float(lng), datetime.fromtimestamp(timestamp, tz=dt_timezone.utc))
+        key = (int(ride_id), user_id)
+        with self._lock:
+            buffer = self._buffers.setdefault(key, [])
+            buffer.append(point)
+            if len(buffer) >= self.chunk_size:
+                self._ready.append(RideTrailChunk.pack(key[0], key[1], buffer))
+                del self._buffers[key]
+        self._flusher.start()
+
+    def close(self, ride_id, user_id=None):
+        """Turns the open buffers of a ride (or of one user in it) into chunks for the next flush."""
+        ride_id = int(ride_id)
+        with self._lock:
+            self._close(lambda key: key[0] == ride_id and (user_id is None or key[1] == user_id))
+
+    def _close(self, matches):
+        for key in [key for key in self._buffers if matches(key)]:
+            self._ready.append(RideTrailChunk.pack(key[0], key[1], self._buffers.pop(key)))
+
+    def flush(self, partial=False):
+        """
+        Saves the finished chunks, plus every open buffer with `partial`.
+        Returns the number of chunks written.
+        """
+        with self._lock:
+            if partial:
+                self._close(lambda key: True)
+            chunks, self._ready = self._ready, []
+        if not chunks:
+            return 0
+        try:
+            RideTrailChunk.objects.bulk_create(chunks, batch_size=100)
+        except Exception:
+            # The insert is atomic; queue the chunks again as unsaved rows
+            for chunk in chunks:
+                chunk.pk = None
+                chunk._state.adding = True
+            with self._lock:
+                self._ready[:0] = chunks
+            raise
+        return len(chunks)
+
+
+def iter_trail(ride_id, user_id=None):
+    """
+    Streams (lat, lng, datetime) points of a ride in time order, one chunk
+    at a time. Restrict to one user's trail with `user_id`; otherwise every
+    user's trail is merged by timestamp.
+    """
+    if user_id is not None:
+        return _iter_user_trail(ride_id, user_id)
+    user_ids = (
+        RideTrailChunk.objects.filter(ride_id=ride_id)
+        .order_by().values_list('user_id', flat=True).distinct()
+    )
+    return heapq.merge(*(_iter_user_trail(ride_id, uid) for uid in user_ids), key=itemgetter(2))
+
+
+def _iter_user_trail(ride_id, user_id):
+    chunks = RideTrailChunk.objects.filter(ride_id=ride_id, user_id=user_id)
+    for chunk in chunks.iterator(chunk_size=50):
+        yield from chunk.points()
+
+
+def trail_distance_km(ride_id, user_id):
+    """Actual distance travelled by `user_id` during the ride, from the stored trail."""
+    total = 0.0
+    last = None
+    chunks = RideTrailChunk.objects.filter(ride_id=ride_id, user_id=user_id).only('lat_e6', 'lng_e6')
+    for chunk in chunks.iterator(chunk_size=50):
+        lats = np.asarray(unpack_int32(chunk.lat_e6), dtype=np.float64) / MICRODEGREES
+        lngs = np.asarray(unpack_int32(chunk.lng_e6), dtype=np.float64) / MICRODEGREES
+        if last is not None:
+            # Bridge the gap between consecutive chunks
+            lats = np.concatenate(([last[0]], lats))
+            lngs = np.concatenate(([last[1]], lngs))
+        if len(lats) > 1:
+            total += float(pairwise_distances(lats[:-1], lngs[:-1], lats[1:], lngs[1:]).sum())
+        last = (lats[-1], lngs[-1])
+    return total
+
+
+trail_writer = TrailWriter(
+    chunk_size=getattr(settings, 'RIDE_TRAIL_CHUNK_SIZE', 256),
+    flush_interval=getattr(settings, 'RIDE_TRAIL_FLUSH_INTERVAL', 10),
+)
@@ -0,0 +1,105 @@
+"""
+Compact binary wire protocol for the tracking sockets.
+
+Clients opt in by offering the `rajbari.bin.v1` WebSocket subprotocol;
+everyone else keeps the plain JSON protocol. Every binary frame starts
+with a one-byte type tag:
+
+    0x01  location (server -> client)  <B I i i B   user_id, lat_e6, lng_e6, role   14 bytes
+    0x02  location (client -> server)  <B i i       lat_e6, lng_e6                   9 bytes
+    0x00  any other message            <B + compact UTF-8 JSON
+
+Coordinates are microdegrees (~11 cm), the same precision as ride trails.
+"""
+import asyncio
+import json
+import struct
+
+from .models import MICRODEGREES
+from .outbox import outbox
+
+PROTOCOL = 'rajbari.bin.v1'
+
+TAG_JSON = 0x00
+TAG_LOCATION = 0x01
+TAG_LOCATION_UPDATE = 0x02
+
+LOCATION = struct.Struct('<BIiiB')
+LOCATION_UPDATE = struct.Struct('<Bii')
+
+ROLES = ['', 'RIDER', 'DRIVER']
+ROLE_CODES = {role: code for code, role in enumerate(ROLES)}
+
+
+def compact_json(content):
+    return json.dumps(content, separators=(',', ':'))
+
+
+def encode(content):
+    """Encodes an outgoing message (the dict a JSON client would get)."""
+    if content.get('type') == 'location_update' and 'user_id' in content:
+        return LOCATION.pack(
+            TAG_LOCATION,
+            content['user_id'],
+            round(float(content['lat']) * MICRODEGREES),
+            round(float(content['lng']) * MICRODEGREES),
+            ROLE_CODES.get(content.get('role'), 0),
+        )
+    return bytes([TAG_JSON]) + compact_json(content).encode()
+
+
+def decode(data):
+    """Decodes an incoming binary frame into the dict a JSON client would send."""
+    if not data:
+        raise ValueError("Empty frame")
+    tag = data[0]
+    if tag == TAG_LOCATION_UPDATE:
+        _, lat, lng = LOCATION_UPDATE.unpack(data)
+        return {'type': 'location_update', 'lat': lat / MICRODEGREES, 'lng': lng / MICRODEGREES}
+    if tag == TAG_LOCATION:
+        _, user_id, lat, lng, role = LOCATION.unpack(data)
+        if role >= len(ROLES):
+            raise ValueError(f"Unknown role code {role}")
+        return {
+            'type': 'location_update', 'user_id': user_id,
+            'lat': lat / MICRODEGREES, 'lng': lng / MICRODEGREES, 'role': ROLES[role],
+        }
+    if tag == TAG_JSON:
+        return json.loads(data[1:].decode())
+    raise ValueError(f"Unknown frame type {tag:#04x}")
+
+
+class WireProtocolMixin:
+    """
+    Lets an AsyncJsonWebsocketConsumer speak either JSON or the binary
+    protocol, chosen per connection from the offered subprotocols.
+    Call `accept_protocol()` instead of `accept()`.
+    """
+
+    binary = False
+
+    async def accept_protocol(self):
+        # In-memory layer sends from other threads must run on this loop
+        outbox.bind_loop(asyncio.get_running_loop())
+        self.binary = PROTOCOL in self.scope.get('subprotocols', [])
+        await self.accept(subprotocol=PROTOCOL if self.binary else None)
+
+    async def receive(self, text_data=None, bytes_data=None, **kwargs):
+        if bytes_data is not None:
+            try:
+                content = decode(bytes_data)
+            except (ValueError, struct.error, UnicodeDecodeError):
+                return  # Drop malformed frames, like unknown JSON message types
+            await self.receive_json(content, **kwargs)
+        else:
+            await super().receive(text_data=text_data, bytes_data=bytes_data, **kwargs)
+
+    async def send_json(self, content, close=False):
+        if self.binary:
+            await self.send(bytes_data=encode(content), close=close)
+        else:
+            await super().send_json(content, close=close)
+
+    @classmethod
+    async def encode_json(cls, content):
+        return compact_json(content)
@@ -0,0 +1,126 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+
+class TokenCache:
+    """
+    Process-level cache of token key -> (token, user, profile), shared by the
+    DRF authentication class and the WebSocket middleware.
+
+    Lookups hand out copies, so request code can mutate its user/profile
+    freely. Entries are dropped when their token is deleted (logout) or their
+    user or profile is saved (see the signals in models.py), expire after
+    `ttl` seconds so other processes' changes are picked up, and the least
+    recently used are evicted beyond `max_entries`.
+    """
+
+    def __init__(self, ttl=60, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (expires_at, token, user, profile)
+        self._keys_by_user = {}  # user_id -> {key, ...}
+        self._lock = threading.Lock()
+
+    def authenticate(self, key):
+        """(token, user) for a token key with `user.profile` preloaded, or None."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._copies(*entry[1:])
+            self.misses += 1
+
+        entry = self._load(key)
+        if entry is None:
+            return None
+        with self._lock:
+            self._store(key, (now + self.ttl,) + entry)
+        return self._copies(*entry)
+
+    @staticmethod
+    def _load(key):
+        from rest_framework.authtoken.models import Token
+        from .models import Profile
+
+        try:
+            token = Token.objects.select_related('user__profile').get(key=key)
+        except Token.DoesNotExist:
+            return None
+        user = token.user
+        try:
+            profile = user.profile
+        except Profile.DoesNotExist:
+            profile = None
+        return token, user, profile
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        self._keys_by_user.setdefault(entry[2].pk, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            old_key, old_entry = self._entries.popitem(last=False)
+            self._discard_user_key(old_entry[2].pk, old_key)
+
+    def _discard_user_key(self, user_id, key):
+        keys = self._keys_by_user.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[user_id]
+
+    @staticmethod
+    def _copies(token, user, profile):
+        user = copy.copy(user)
+        token = copy.copy(token)
+        token._state.fields_cache['user'] = user
+        if profile is not None:
+            profile = copy.copy(profile)
+            profile._state.fields_cache['user'] = user
+            user._state.fields_cache['profile'] = profile
+        return token, user
+
+    def invalidate_key(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry:
+                self._discard_user_key(entry[2].pk, key)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for key in self._keys_by_user.pop(user_id, ()):
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+
+token_cache = TokenCache(
+    ttl=getattr(settings, 'AUTH_TOKEN_CACHE_TTL', 60),
+    max_entries=getattr(settings, 'AUTH_TOKEN_CACHE_SIZE', 10000),
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication served from `token_cache` (no queries when warm)."""
+
+    def authenticate_credentials(self, key):
+        result = token_cache.authenticate(key)
+        if result is None:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        token, user = result
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return (user, token)
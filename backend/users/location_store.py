@@ -0,0 +1,100 @@
+import threading
+
+from django.conf import settings
+
+from rajbari_ride.background import PeriodicTask
+from rides.geo import encode_geohash
+
+
+class LocationStore:
+    """
+    Write-behind store for users' last known position.
+
+    Location updates land here (one dict write) instead of a full
+    `Profile.save()`. The latest fix per user is persisted every
+    `flush_interval` seconds with a single `bulk_update` of the location
+    columns, plus once more at shutdown. Reads see a fix from memory only
+    until it is flushed; after that the row is the source of truth, so a
+    newer fix written by another process is not hidden by an old one here.
+    """
+
+    FIELDS = ['current_lat', 'current_lng', 'geohash']
+
+    def __init__(self, flush_interval=5):
+        self._latest = {}  # user_id -> (lat, lng), until flushed
+        self._dirty = {}  # profile_id -> (user_id, lat, lng, geohash)
+        self._lock = threading.Lock()
+        self._flusher = PeriodicTask('location-store-flush', flush_interval, self.flush)
+
+    def record(self, profile, lat, lng):
+        """
+        Takes a new fix for `profile`. The instance's location attributes are
+        updated in memory; the database row is written on the next flush.
+        Returns the previous known (lat, lng), or None.
+        """
+        lat, lng = float(lat), float(lng)
+        geohash = encode_geohash(lat, lng)
+        previous = self.position_of(profile)
+        profile.current_lat = lat
+        profile.current_lng = lng
+        profile.geohash = geohash
+        with self._lock:
+            self._latest[profile.user_id] = (lat, lng)
+            self._dirty[profile.pk] = (profile.user_id, lat, lng, geohash)
+        self._flusher.start()
+        return previous
+
+    def get(self, user_id):
+        """Latest (lat, lng) recorded in this process and not yet flushed, or None."""
+        return self._latest.get(user_id)
+
+    def unflushed(self):
+        """Copy of every {user_id: (lat, lng)} not yet written to the database."""
+        with self._lock:
+            return dict(self._latest)
+
+    def position_of(self, profile):
+        """Latest known (lat, lng) for a profile: an unflushed fix first, then its row."""
+        position = self.get(profile.user_id)
+        if position:
+            return position
+        if profile.current_lat is None or profile.current_lng is None:
+            return None
+        return float(profile.current_lat), float(profile.current_lng)
+
+    def pending(self):
+        return len(self._dirty)
+
+    def flush(self):
+        """Persists every pending fix in one bulk UPDATE. Returns the row count."""
+        from .authentication import token_cache
+        from .models import Profile
+
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+        if not dirty:
+            return 0
+
+        profiles = []
+        for profile_id, (_, lat, lng, geohash) in dirty.items():
+            profiles.append(Profile(pk=profile_id, current_lat=lat, current_lng=lng, geohash=geohash))
+        try:
+            Profile.objects.bulk_update(profiles, self.FIELDS, batch_size=500)
+        except Exception:
+            # Put the fixes back unless a newer one arrived meanwhile
+            with self._lock:
+                for profile_id, fix in dirty.items():
+                    self._dirty.setdefault(profile_id, fix)
+            raise
+        with self._lock:
+            # Saved fixes are read from the row from now on, unless a newer one arrived
+            for profile_id, (user_id, lat, lng, _) in dirty.items():
+                if profile_id not in self._dirty and self._latest.get(user_id) == (lat, lng):
+                    del self._latest[user_id]
+        # bulk_update() sends no signal; cached auth profiles would keep the old position
+        for user_id, _, _, _ in dirty.values():
+            token_cache.invalidate_user(user_id)
+        return len(profiles)
+
+
+location_store = LocationStore(flush_interval=getattr(settings, 'LOCATION_FLUSH_INTERVAL', 5))
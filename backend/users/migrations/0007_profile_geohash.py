@@ -0,0 +1,32 @@
+# Generated by Django 6.0 on 2026-10-18 06:35
+
+from django.db import migrations, models
+
+
+def populate_geohash(apps, schema_editor):
+    from rides.geo import encode_geohash
+
+    Profile = apps.get_model("users", "Profile")
+    profiles = list(
+        Profile.objects.filter(current_lat__isnull=False, current_lng__isnull=False).only(
+            "id", "current_lat", "current_lng"
+        )
+    )
+    for profile in profiles:
+        profile.geohash = encode_geohash(profile.current_lat, profile.current_lng)
+    Profile.objects.bulk_update(profiles, ["geohash"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0006_profile_home_address_profile_is_verified_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profile",
+            name="geohash",
+            field=models.CharField(blank=True, db_index=True, max_length=12, null=True),
+        ),
+        migrations.RunPython(populate_geohash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-18 06:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0007_profile_geohash"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profile",
+            name="last_seen",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
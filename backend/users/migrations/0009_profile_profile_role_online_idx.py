@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 07:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0008_profile_last_seen"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="profile",
+            index=models.Index(fields=["role", "is_online"], name="profile_role_online_idx"),
+        ),
+    ]
@@ -1,7 +1,22 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from rides.geo import GeoQuerySet, encode_geohash
+from .authentication import token_cache
+
+class ProfileQuerySet(GeoQuerySet):
+    lat_field = 'current_lat'
+    lng_field = 'current_lng'
+    geohash_field = 'geohash'
+
+    def online_drivers(self):
+        return self.filter(
+            role='DRIVER',
+            is_online=True,
+            current_lat__isnull=False,
+            current_lng__isnull=False
+        )
 
 class Profile(models.Model):
     ROLE_CHOICES = (
@@ -11,6 +26,8 @@ class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     role = models.CharField(max_length=10, choices=ROLE_CHOICES, default='RIDER')
     is_online = models.BooleanField(default=False)
+    # Last heartbeat stamped by the presence sweeper (see users.presence)
+    last_seen = models.DateTimeField(null=True, blank=True)
     phone_number = models.CharField(max_length=15, null=True, blank=True)
     
     # Verification System
@@ -37,11 +54,31 @@ class Profile(models.Model):
     
     current_lat = models.DecimalField(max_digits=22, decimal_places=16, null=True, blank=True)
     current_lng = models.DecimalField(max_digits=22, decimal_places=16, null=True, blank=True)
+    # Cell of (current_lat, current_lng), kept in sync on save, for proximity prefilters
+    geohash = models.CharField(max_length=12, null=True, blank=True, db_index=True)
+
+    objects = ProfileQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # online_drivers(): spatial index reloads, matcher, presence sweeps
+            models.Index(fields=['role', 'is_online'], name='profile_role_online_idx'),
+        ]
 
     def __str__(self):
         status = "✅" if self.is_verified else "❌"
         return f"{status} {self.user.username} ({self.role})"
 
+    def save(self, *args, **kwargs):
+        if self.current_lat is not None and self.current_lng is not None:
+            self.geohash = encode_geohash(self.current_lat, self.current_lng)
+        else:
+            self.geohash = None
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'current_lat', 'current_lng'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geohash'}
+        super().save(*args, **kwargs)
+
 class DriverDocument(models.Model):
     DOCUMENT_TYPES = (
         ('NID', 'National ID'),
@@ -67,3 +104,12 @@ def create_profile(sender, instance, created, **kwargs):
     if created:
         Profile.objects.create(user=instance)
 
+# Cached logins must see role/online changes and logouts
+@receiver([post_save, post_delete], sender=User)
+@receiver([post_save, post_delete], sender=Profile)
+def invalidate_cached_tokens(sender, instance, **kwargs):
+    token_cache.invalidate_user(instance.user_id if sender is Profile else instance.pk)
+
+@receiver(post_delete, sender='authtoken.Token')
+def invalidate_deleted_token(sender, instance, **kwargs):
+    token_cache.invalidate_key(instance.key)
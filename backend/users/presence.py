@@ -0,0 +1,97 @@
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from rajbari_ride.background import PeriodicTask
+
+
+class PresenceRegistry:
+    """
+    Heartbeat-based presence for online drivers.
+
+    Open sockets and location fixes count as heartbeats and are tracked in
+    memory (no DB access). Every `sweep_interval` seconds the registry
+    stamps `Profile.last_seen` for everyone alive in this process with one
+    UPDATE, then turns off every online driver not seen by any process for
+    `ttl` seconds with one more, so drivers whose app died stop being
+    offered rides.
+    """
+
+    def __init__(self, ttl=90, sweep_interval=30):
+        self.ttl = ttl
+        self._seen = {}  # user_id -> monotonic time of the last heartbeat
+        self._sockets = {}  # user_id -> open socket count
+        self._lock = threading.Lock()
+        self._sweeper = PeriodicTask('presence-sweep', sweep_interval, self.sweep)
+
+    def heartbeat(self, user_id):
+        self._seen[user_id] = time.monotonic()
+        self._sweeper.start()
+
+    def connected(self, user_id):
+        with self._lock:
+            self._sockets[user_id] = self._sockets.get(user_id, 0) + 1
+        self.heartbeat(user_id)
+
+    def disconnected(self, user_id):
+        with self._lock:
+            count = self._sockets.pop(user_id, 0) - 1
+            if count > 0:
+                self._sockets[user_id] = count
+        # The TTL runs from the moment the last socket closed
+        self.heartbeat(user_id)
+
+    def is_present(self, user_id):
+        """Whether `user_id` is alive according to this process alone."""
+        if self._sockets.get(user_id):
+            return True
+        seen = self._seen.get(user_id)
+        return seen is not None and time.monotonic() - seen < self.ttl
+
+    def alive(self):
+        """User ids alive in this process; forgets the expired ones."""
+        cutoff = time.monotonic() - self.ttl
+        with self._lock:
+            self._seen = {user_id: seen for user_id, seen in self._seen.items() if seen >= cutoff}
+            return set(self._seen) | set(self._sockets)
+
+    def sweep(self):
+        """
+        Publishes this process's heartbeats and expires stale drivers.
+        Returns the user ids that were turned offline.
+        """
+        from rides.dispatch import driver_moved_event, notify_driver
+        from rides.spatial_index import driver_index
+        from .authentication import token_cache
+        from .models import Profile
+
+        now = timezone.now()
+        alive = self.alive()
+        if alive:
+            Profile.objects.filter(user_id__in=alive).update(last_seen=now)
+
+        stale = (
+            Profile.objects.filter(role='DRIVER', is_online=True)
+            .filter(Q(last_seen__lt=now - timedelta(seconds=self.ttl)) | Q(last_seen__isnull=True))
+            .exclude(user_id__in=alive)
+        )
+        expired = list(stale.values_list('user_id', flat=True))
+        if not expired:
+            return []
+        # Re-checks the cutoff so a driver seen meanwhile stays online
+        stale.filter(user_id__in=expired).update(is_online=False)
+        for user_id in expired:
+            driver_index.remove(user_id)
+            token_cache.invalidate_user(user_id)  # update() sends no signal
+            notify_driver(user_id, driver_moved_event(None, None, None))
+        return expired
+
+
+presence = PresenceRegistry(
+    ttl=getattr(settings, 'PRESENCE_TTL', 90),
+    sweep_interval=getattr(settings, 'PRESENCE_SWEEP_INTERVAL', 30),
+)
@@ -1,9 +1,16 @@
+from django.utils import timezone
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from .serializers import UserSerializer, LoginSerializer
+from rides.spatial_index import driver_index
+from rides.dispatch import driver_moved_event, notify_driver
+from .models import Profile
+from .location_store import location_store
+from .presence import presence
+from .authentication import token_cache
 
 class RegisterView(generics.CreateAPIView):
     serializer_class = UserSerializer
@@ -52,10 +59,20 @@ class UpdateLocationView(APIView):
             
         try:
             profile = user.profile
-            profile.current_lat = lat
-            profile.current_lng = lng
-            profile.is_online = True
-            profile.save()
+            # Position is written behind in bulk; only the online flag is written now
+            previous = location_store.record(profile, lat, lng)
+            presence.heartbeat(user.id)
+            if not profile.is_online:
+                # Stamped together so no sweeper expires the driver before their next heartbeat
+                profile.last_seen = timezone.now()
+                Profile.objects.filter(pk=profile.pk).update(is_online=True, last_seen=profile.last_seen)
+                profile.is_online = True
+                token_cache.invalidate_user(user.id)  # update() sends no signal
+                previous = None
+            driver_index.sync_profile(profile)
+            if profile.role == 'DRIVER':
+                # Moves the driver's notification socket to their new geocell groups
+                notify_driver(user.id, driver_moved_event(previous, profile.current_lat, profile.current_lng))
             return Response({"status": "Location updated", "is_online": True})
         except Exception as e:
              return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -77,7 +94,17 @@ class ProfileToggleOnlineView(APIView):
         else:
             profile.is_online = bool(is_online)
             
-        profile.save()
+        # Only the flag: the position columns are owned by the location store
+        update_fields = ['is_online']
+        if profile.is_online:
+            presence.heartbeat(user.id)
+            profile.last_seen = timezone.now()
+            update_fields.append('last_seen')
+        profile.save(update_fields=update_fields)
+        driver_index.sync_profile(profile)
+        # Offline drivers leave their geocell groups; online ones (re)join them
+        position = location_store.position_of(profile) if profile.is_online else None
+        notify_driver(user.id, driver_moved_event(None, *(position or (None, None))))
         return Response({
             "status": "Online status updated",
             "is_online": profile.is_online
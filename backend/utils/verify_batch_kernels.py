@@ -0,0 +1,108 @@
+import os
+import sys
+import random
+import timeit
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "rajbari_ride.settings")
+
+import django
+django.setup()
+
+import numpy as np
+from rides.utils import (
+    calculate_distance, calculate_fare, pairwise_distances, distances_from,
+    distance_matrix, segment_speeds_kmh, calculate_fares
+)
+
+N = 10000
+
+def random_points(n):
+    # Spread around Rajbari district
+    lats = [23.60 + random.random() * 0.40 for _ in range(n)]
+    lngs = [89.40 + random.random() * 0.50 for _ in range(n)]
+    return lats, lngs
+
+# Vector and scalar haversine differ only by float rounding
+ATOL_KM = 1e-6
+
+def check(label, compare):
+    """Runs one numpy.testing assertion; prints the outcome and returns whether it passed."""
+    try:
+        compare()
+    except AssertionError as e:
+        print(f"❌ FAIL: {label}\n{e}")
+        return False
+    print(f"✅ {label}")
+    return True
+
+def test_parity():
+    """Returns the number of kernels that disagree with their scalar versions."""
+    print("\n[TEST] Parity with scalar functions")
+    lats1, lngs1 = random_points(N)
+    lats2, lngs2 = random_points(N)
+    results = []
+
+    scalar = [calculate_distance(a, b, c, d) for a, b, c, d in zip(lats1, lngs1, lats2, lngs2)]
+    vector = pairwise_distances(lats1, lngs1, lats2, lngs2)
+    print(f"pairwise max abs diff: {np.max(np.abs(vector - scalar)):.2e} km")
+    results.append(check("pairwise distances", lambda: np.testing.assert_allclose(vector, scalar, rtol=0, atol=ATOL_KM)))
+
+    one = [calculate_distance(lats1[0], lngs1[0], c, d) for c, d in zip(lats2, lngs2)]
+    from_one = distances_from(lats1[0], lngs1[0], lats2, lngs2)
+    print(f"one-to-many max abs diff: {np.max(np.abs(from_one - one)):.2e} km")
+    results.append(check("one-to-many distances", lambda: np.testing.assert_allclose(from_one, one, rtol=0, atol=ATOL_KM)))
+
+    matrix = distance_matrix(lats1[:50], lngs1[:50], lats2[:80], lngs2[:80])
+    expected = [[calculate_distance(lats1[i], lngs1[i], lats2[j], lngs2[j]) for j in range(80)] for i in range(50)]
+    print(f"matrix {matrix.shape} max abs diff: {np.max(np.abs(matrix - expected)):.2e} km")
+    results.append(check("distance matrix", lambda: np.testing.assert_allclose(matrix, expected, rtol=0, atol=ATOL_KM)))
+
+    for base, per_km in [(0, 10), (50.0, 20.0), (30.0, 12.5)]:
+        scalar_fares = [calculate_fare(d, base_fare=base, per_km_rate=per_km) for d in scalar]
+        vector_fares = calculate_fares(vector, base_fare=base, per_km_rate=per_km)
+        mismatches = int(np.sum(vector_fares != scalar_fares))
+        print(f"fares base={base} per_km={per_km}: {mismatches} mismatches")
+        results.append(check(
+            f"fares base={base} per_km={per_km}",
+            lambda: np.testing.assert_array_equal(vector_fares, scalar_fares)
+        ))
+
+    times = np.arange(N) * 5.0
+    speeds = segment_speeds_kmh(lats1, lngs1, times)
+    expected_speeds = [calculate_distance(lats1[i], lngs1[i], lats1[i + 1], lngs1[i + 1]) / 5.0 * 3600 for i in range(N - 1)]
+    print(f"speeds max abs diff: {np.max(np.abs(speeds - expected_speeds)):.2e} km/h")
+    results.append(check(
+        "segment speeds",
+        lambda: np.testing.assert_allclose(speeds, expected_speeds, rtol=0, atol=ATOL_KM / 5.0 * 3600)
+    ))
+
+    return results.count(False)
+
+def benchmark():
+    print(f"\n[BENCH] {N} point pairs")
+    lats1, lngs1 = random_points(N)
+    lats2, lngs2 = random_points(N)
+    a1, o1, a2, o2 = (np.array(v) for v in (lats1, lngs1, lats2, lngs2))
+
+    scalar = timeit.timeit(
+        lambda: [calculate_distance(a, b, c, d) for a, b, c, d in zip(lats1, lngs1, lats2, lngs2)], number=5) / 5
+    vector = timeit.timeit(lambda: pairwise_distances(a1, o1, a2, o2), number=5) / 5
+    print(f"distance scalar: {scalar * 1000:.2f} ms  vector: {vector * 1000:.2f} ms  ({scalar / vector:.0f}x)")
+
+    dists = pairwise_distances(a1, o1, a2, o2)
+    scalar = timeit.timeit(lambda: [calculate_fare(d, 50.0, 20.0) for d in dists.tolist()], number=5) / 5
+    vector = timeit.timeit(lambda: calculate_fares(dists, 50.0, 20.0), number=5) / 5
+    print(f"fare scalar: {scalar * 1000:.2f} ms  vector: {vector * 1000:.2f} ms  ({scalar / vector:.0f}x)")
+
+    vector = timeit.timeit(lambda: distance_matrix(a1[:200], o1[:200], a2[:1000], o2[:1000]), number=5) / 5
+    print(f"200x1000 distance matrix: {vector * 1000:.2f} ms")
+
+if __name__ == "__main__":
+    failures = test_parity()
+    benchmark()
+    if failures:
+        print(f"\n{failures} kernel(s) disagree with the scalar functions")
+        sys.exit(1)
@@ -0,0 +1,67 @@
+import os
+import sys
+import random
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "rajbari_ride.settings")
+
+import django
+django.setup()
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rides.quotes import fare_quotes
+from vehicles.models import VehicleType
+
+def estimate(client, lat, lng, vehicle_type=None):
+    data = {"pickup_lat": lat, "pickup_lng": lng, "drop_lat": 23.80, "drop_lng": 89.70}
+    if vehicle_type:
+        data["requested_vehicle_type"] = vehicle_type.id
+    return client.post('/api/rides/fare-estimate/', data, format='json')
+
+def test_pin_drag(client, v_type):
+    print("\n[TEST] Dragging the pickup pin (100 requests within ~60 m)")
+    fare_quotes.clear()
+    estimate(client, 23.7600, 89.6500, v_type)  # warm the rate table
+    with CaptureQueriesContext(connection) as ctx:
+        for _ in range(100):
+            response = estimate(
+                client, 23.7600 + random.uniform(0, 0.0005), 89.6500 + random.uniform(0, 0.0005), v_type
+            )
+            assert response.status_code == 200, response.data
+    stats = fare_quotes.stats()
+    print(f"   Queries: {len(ctx.captured_queries)}, hits: {stats['hits']}, misses: {stats['misses']}")
+    if len(ctx.captured_queries) == 0 and stats['hits'] > stats['misses']:
+        print("✅ SUCCESS: Served from cache without touching the database")
+    else:
+        print("❌ FAIL: Expected no queries and mostly hits")
+
+def test_invalidation(client, v_type):
+    print("\n[TEST] Saving a VehicleType invalidates cached quotes")
+    before = estimate(client, 23.7600, 89.6500, v_type).data['estimated_fare']
+    original = v_type.base_fare
+    v_type.base_fare = original + 100
+    v_type.save()
+    try:
+        after = estimate(client, 23.7600, 89.6500, v_type).data['estimated_fare']
+    finally:
+        v_type.base_fare = original
+        v_type.save()
+    print(f"   Fare before: {before}, after +100 base fare: {after}")
+    if after - before == 100:
+        print("✅ SUCCESS: New rates applied immediately")
+    else:
+        print("❌ FAIL: Stale quote served")
+
+if __name__ == "__main__":
+    client = APIClient()
+    v_type = VehicleType.objects.first()
+    if not v_type:
+        print("No VehicleType found; run utils/seed_vehicles.py first")
+        sys.exit(1)
+    test_pin_drag(client, v_type)
+    test_invalidation(client, v_type)
+    print(f"\nStats: {fare_quotes.stats()}")
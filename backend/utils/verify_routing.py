@@ -0,0 +1,136 @@
+import os
+import sys
+import random
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "rajbari_ride.settings")
+
+import django
+django.setup()
+
+import numpy as np
+from rides.routing import RoadGraph, Router
+from rides.utils import calculate_distance
+
+# Synthetic street grid around Rajbari town: a primary road every 5th row/column,
+# residential streets elsewhere, and every 3rd residential row one-way.
+ROWS, COLS = 60, 60
+ORIGIN = (23.72, 89.60)
+STEP = 0.0015  # ~165 m
+
+def write_grid_osm(path):
+    with open(path, 'w') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<osm version="0.6">\n')
+        for r in range(ROWS):
+            for c in range(COLS):
+                f.write(f'<node id="{r * COLS + c + 1}" lat="{ORIGIN[0] + r * STEP:.7f}" lon="{ORIGIN[1] + c * STEP:.7f}"/>\n')
+        way_id = 1
+        for r in range(ROWS):
+            highway = 'primary' if r % 5 == 0 else 'residential'
+            oneway = '<tag k="oneway" v="yes"/>' if highway == 'residential' and r % 3 == 0 else ''
+            refs = ''.join(f'<nd ref="{r * COLS + c + 1}"/>' for c in range(COLS))
+            f.write(f'<way id="{way_id}">{refs}<tag k="highway" v="{highway}"/>{oneway}</way>\n')
+            way_id += 1
+        for c in range(COLS):
+            highway = 'primary' if c % 5 == 0 else 'residential'
+            refs = ''.join(f'<nd ref="{r * COLS + c + 1}"/>' for r in range(ROWS))
+            f.write(f'<way id="{way_id}">{refs}<tag k="highway" v="{highway}"/></way>\n')
+            way_id += 1
+        f.write('</osm>\n')
+
+def random_point():
+    return (
+        ORIGIN[0] + random.random() * (ROWS - 1) * STEP,
+        ORIGIN[1] + random.random() * (COLS - 1) * STEP,
+    )
+
+def test_astar_matches_dijkstra(graph):
+    print("\n[TEST] A* (ALT) vs plain Dijkstra")
+    for _ in range(50):
+        s, t = random.randrange(graph.node_count), random.randrange(graph.node_count)
+        exact = graph._dijkstra_all(s)[t]
+        km, minutes = graph.route(s, t)
+        if abs(minutes - exact) > 1e-6:
+            print(f"❌ FAIL: {s}->{t} A* {minutes:.4f} min, Dijkstra {exact:.4f} min")
+            return
+    print("✅ SUCCESS: 50 random routes have optimal travel time")
+
+def test_matrix_matches_route(router):
+    print("\n[TEST] Matrix mode vs point-to-point")
+    sources = [random_point() for _ in range(5)]
+    targets = [random_point() for _ in range(20)]
+    fresh = Router(router.graph)
+    distance, duration = fresh.matrix(sources, targets)
+    for i, (lat1, lng1) in enumerate(sources):
+        for j, (lat2, lng2) in enumerate(targets):
+            km, minutes = Router(router.graph).route(lat1, lng1, lat2, lng2)
+            if abs(duration[i, j] - minutes) > 1e-6:
+                print(f"❌ FAIL: ({i},{j}) matrix {duration[i, j]:.4f} vs route {minutes:.4f}")
+                return
+    print("✅ SUCCESS: 5x20 matrix matches point-to-point routes")
+
+def test_road_vs_straight_line(router):
+    print("\n[TEST] Road distance vs straight line")
+    ratios = []
+    for _ in range(200):
+        lat1, lng1 = random_point()
+        lat2, lng2 = random_point()
+        straight = calculate_distance(lat1, lng1, lat2, lng2)
+        if straight < 0.5:
+            continue
+        km, _ = router.route(lat1, lng1, lat2, lng2)
+        ratios.append(km / straight)
+    print(f"   Road/straight ratio: min {min(ratios):.2f}, mean {np.mean(ratios):.2f}, max {max(ratios):.2f}")
+    if min(ratios) >= 0.99:
+        print("✅ SUCCESS: Road distance never undercuts the straight line")
+    else:
+        print("❌ FAIL: Road distance shorter than straight line")
+
+def benchmark(graph, router):
+    print("\n[BENCH] Query timings")
+    pairs = [(random.randrange(graph.node_count), random.randrange(graph.node_count)) for _ in range(100)]
+
+    start = time.perf_counter()
+    for s, t in pairs:
+        graph.route(s, t)
+    astar = (time.perf_counter() - start) / len(pairs)
+
+    start = time.perf_counter()
+    for s, t in pairs[:20]:
+        graph._dijkstra_all(s)
+    dijkstra = (time.perf_counter() - start) / 20
+
+    print(f"   A* (ALT):            {astar * 1000:.2f} ms/route")
+    print(f"   Full Dijkstra:       {dijkstra * 1000:.2f} ms/route")
+
+    sources = [random_point() for _ in range(10)]
+    targets = [random_point() for _ in range(50)]
+    start = time.perf_counter()
+    Router(graph).matrix(sources, targets)
+    print(f"   10x50 matrix (cold): {(time.perf_counter() - start) * 1000:.1f} ms")
+    router.matrix(sources, targets)
+    start = time.perf_counter()
+    router.matrix(sources, targets)
+    print(f"   10x50 matrix (warm): {(time.perf_counter() - start) * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    random.seed(7)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'grid.osm')
+        write_grid_osm(path)
+        start = time.perf_counter()
+        graph = RoadGraph.from_osm(path)
+        print(f"Built {graph.node_count} nodes / {len(graph.targets)} edges in {time.perf_counter() - start:.2f} s")
+
+        graph.save(path + '.graph.npz')
+        graph = RoadGraph.load(path + '.graph.npz')
+        router = Router(graph)
+
+        test_astar_matches_dijkstra(graph)
+        test_matrix_matches_route(router)
+        test_road_vs_straight_line(router)
+        benchmark(graph, router)
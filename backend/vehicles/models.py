@@ -1,5 +1,8 @@
 from django.db import models
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from users.models import Profile
+from .rates import rate_table
 
 class VehicleType(models.Model):
     name = models.CharField(max_length=50, unique=True) # e.g., 'Bike', 'Car', 'SUV', 'Ambulance'
@@ -33,3 +36,7 @@ class Vehicle(models.Model):
 
     def __str__(self):
         return f"{self.color} {self.make} {self.model} ({self.plate_number})"
+
+@receiver([post_save, post_delete], sender=VehicleType)
+def invalidate_rate_table(sender, **kwargs):
+    rate_table.invalidate()
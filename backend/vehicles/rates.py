@@ -0,0 +1,59 @@
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+
+VehicleRate = namedtuple('VehicleRate', ['id', 'name', 'base_fare', 'per_km_rate', 'per_minute_rate'])
+
+
+class RateTable:
+    """
+    In-memory copy of every VehicleType's fare rates.
+
+    Loaded with one query on first use. Saving or deleting a VehicleType
+    invalidates it in this process (see the signals in models.py); other
+    processes pick the change up after `ttl` seconds at the latest.
+    """
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self.version = 0  # bumped whenever the rates may have changed; part of quote cache keys
+        self._rates = None
+        self._loaded_at = 0
+        self._lock = threading.Lock()
+
+    def _load(self):
+        from .models import VehicleType
+
+        rows = VehicleType.objects.values_list('id', 'name', 'base_fare', 'per_km_rate', 'per_minute_rate')
+        return {
+            row[0]: VehicleRate(row[0], row[1], float(row[2]), float(row[3]), float(row[4]))
+            for row in rows
+        }
+
+    def all(self):
+        rates = self._rates
+        if rates is None or time.monotonic() - self._loaded_at > self.ttl:
+            with self._lock:
+                if self._rates is None or time.monotonic() - self._loaded_at > self.ttl:
+                    loaded = self._load()
+                    # A periodic reload that finds the same rates keeps cached quotes valid
+                    if self._rates is not None and loaded != self._rates:
+                        self.version += 1
+                    self._rates = loaded
+                    self._loaded_at = time.monotonic()
+                rates = self._rates
+        return rates
+
+    def get(self, vehicle_type_id):
+        """VehicleRate for an id, or None if no such type exists."""
+        return self.all().get(int(vehicle_type_id))
+
+    def invalidate(self):
+        with self._lock:
+            self._rates = None
+            self.version += 1
+
+
+rate_table = RateTable(ttl=getattr(settings, 'VEHICLE_RATES_TTL', 60))
@@ -1578,11 +1578,10 @@ document.addEventListener('DOMContentLoaded', () => {
                 url += `&other_user_id=${targetOtherId}`;
             }
 
-            const res = await fetch(url, {
+            const messages = await fetchAllPages(url, {
                 headers: { 'Authorization': `Token ${token}` }
             });
-            if (res.ok) {
-                const messages = await res.json();
+            if (messages) {
                 displayChatMessages(messages);
             }
         } catch (e) {
@@ -1590,6 +1589,19 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    // Lists are paged by cursor; the next page is in the Link header
+    async function fetchAllPages(url, options) {
+        const items = [];
+        while (url) {
+            const res = await fetch(url, options);
+            if (!res.ok) return null;
+            items.push(...await res.json());
+            const next = (res.headers.get('Link') || '').match(/<([^>]+)>;\s*rel="next"/);
+            url = next ? next[1] : null;
+        }
+        return items;
+    }
+
     function displayChatMessages(messages) {
         const messagesDiv = document.getElementById('chat-messages');
         if (!messagesDiv) return;